@@ -356,14 +356,25 @@ The injected asset in the generated html template will look similar to this::
 
 You can read more about it on `pywebpack`_ documentation.
 
+Instead of including each entry where it is needed, templates can collect
+entries during the request and render them all at once. Files shared by
+several entries (e.g. vendor chunks) are then only included once::
+
+    {{ webpack.require('module1.js') }}
+    {{ webpack.require('module2.js', 'module1.js') }}
+    ...
+    {{ webpack.render_collected() }}
+
+Since templates are rendered from top to bottom, ``render_collected()`` must
+come after all ``require()`` calls, e.g. at the end of the ``body`` in the
+base template.
+
 .. _pywebpack: https://pywebpack.readthedocs.io
 """
 
-from pywebpack import WebpackProject
-
 from .bundle import WebpackBundle
 from .ext import FlaskWebpackExt
-from .project import WebpackBundleProject, WebpackTemplateProject
+from .project import WebpackBundleProject, WebpackProject, WebpackTemplateProject
 from .proxies import current_manifest, current_webpack
 
 __version__ = "2.1.0"
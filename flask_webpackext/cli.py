@@ -10,75 +10,483 @@
 
 """CLI for Flask-WebpackExt."""
 
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
 import click
-from flask.cli import with_appcontext
+from flask.cli import ScriptInfo, with_appcontext
 
+from .process import ScriptError, ScriptTimeout, exit_status
+from .project import _ScriptMixin
 from .proxies import current_webpack
+from .timings import start_timings, stop_timings, timed_phase
+from .watch import ProjectWatcher
 
+_Step = namedtuple("_Step", ["name", "run", "skippable", "after"], defaults=[None])
+"""Step of the execution plan of the chained webpack commands.
 
-def _run(cmd, unavailable_msg, success_msg):
-    project = current_webpack.project
+``run`` is called with the project. A ``skippable`` step is skipped if the
+project reports that its inputs did not change since it last ran. ``after``
+is called without arguments after the step, even if it was skipped, as it
+may produce outputs which are not covered by the inputs of the step.
+"""
+
+
+def _run(project, cmd, unavailable_msg, success_msg, **kwargs):
     if not hasattr(project, cmd):
         click.secho(unavailable_msg, fg="yellow")
     else:
-        getattr(current_webpack.project, cmd)()
+        with timed_phase(cmd):
+            getattr(project, cmd)(**kwargs)
         click.secho(success_msg, fg="green")
 
 
 @click.group(chain=True)
+@click.option(
+    "--timings",
+    is_flag=True,
+    default=False,
+    help="Print the duration of each phase of the commands.",
+)
+@click.option(
+    "--timings-report",
+    type=click.Path(dir_okay=False, writable=True),
+    default=None,
+    help="Write the duration of each phase of the commands to a JSON file.",
+)
+@click.option(
+    "--force",
+    is_flag=True,
+    default=False,
+    help="Run all commands, even if their inputs did not change.",
+)
 @with_appcontext
-def webpack():
-    """Webpack commands."""
+@click.pass_context
+def webpack(ctx, timings, timings_report, force):
+    """Webpack commands.
+
+    The chained commands are run in order on the same project. The create
+    and build commands are skipped if their inputs did not change since they
+    last ran, unless --force is given.
+    """
+    if not timings and not timings_report:
+        return
+    recorder = start_timings()
+
+    def report():
+        stop_timings()
+        if timings:
+            click.echo("\n".join(recorder.summary()))
+        if timings_report:
+            with open(timings_report, "w") as fp:
+                json.dump(recorder.report(), fp, indent=2)
+
+    ctx.call_on_close(report)
+
+
+@webpack.result_callback()
+def _execute(steps, force, **kwargs):
+    """Run the steps of the chained commands."""
+    project = current_webpack.project
+    check = not force and hasattr(project, "is_up_to_date")
+    for step in steps:
+        skippable = step.skippable and hasattr(project, "is_up_to_date")
+        if skippable and check and project.is_up_to_date(step.name):
+            click.secho(
+                "Webpack project {} is up to date, skipped.".format(step.name),
+                fg="green",
+            )
+        else:
+            step.run(project)
+            if skippable:
+                project.mark_up_to_date(step.name)
+        if step.after is not None:
+            step.after()
+
+
+def _plan(step):
+    """Add a step to the execution plan of the webpack group, or run it.
+
+    Commands which are not invoked by the webpack group, e.g. with
+    ``ctx.invoke(create)`` from another command, run their step right away.
+    """
+    ctx = click.get_current_context()
+    if ctx.parent is not None and ctx.parent.command is webpack:
+        return step
+    _execute([step], force=False)
+
+
+jobs_option = click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Number of threads used to copy the bundles.",
+)
 
 
 @webpack.command()
+@jobs_option
 @with_appcontext
-def create():
+def create(jobs):
     """Create webpack project. This will fetch the assets."""
-    _run("create", "Nothing to do for project.", "Created webpack project.")
+
+    def step(project):
+        kwargs = {"jobs": jobs} if hasattr(project, "create_report") else {}
+        _run(
+            project,
+            "create",
+            "Nothing to do for project.",
+            "Created webpack project.",
+            **kwargs,
+        )
+        report = getattr(project, "create_report", None)
+        if report is not None:
+            click.echo(report.summary())
+
+    return _plan(_Step("create", step, True))
 
 
 @webpack.command()
 @with_appcontext
 def clean():
     """Remove created webpack project."""
-    _run("clean", "Nothing to do for project.", "Cleaned webpack project.")
+    return _plan(
+        _Step(
+            "clean",
+            lambda project: _run(
+                project,
+                "clean",
+                "Nothing to do for project.",
+                "Cleaned webpack project.",
+            ),
+            False,
+        )
+    )
 
 
 @webpack.command(context_settings={"ignore_unknown_options": True})
+@click.option(
+    "--force-install",
+    is_flag=True,
+    default=False,
+    help="Install even if the dependencies did not change.",
+)
 @click.argument("args", nargs=-1, type=click.UNPROCESSED)
 @with_appcontext
-def install(args):
+def install(force_install, args):
     """Run NPM install."""
-    current_webpack.project.install(*args)
-    click.secho("Installed webpack project.", fg="green")
+
+    def step(project):
+        with timed_phase("install"):
+            if hasattr(project, "install_skipped"):
+                project.install(*args, force=force_install)
+            else:
+                project.install(*args)
+        if getattr(project, "install_skipped", False):
+            click.secho("Dependencies unchanged, skipped install.", fg="green")
+        else:
+            click.secho("Installed webpack project.", fg="green")
+
+    return _plan(_Step("install", step, False))
+
+
+def _post_build(compile_manifest):
+    """Write the integrity values, compressed variants and compiled manifest.
+
+    :returns: List of messages describing the written files.
+    """
+    messages = []
+    with timed_phase("integrity"):
+        path = current_webpack.write_integrity()
+    if path:
+        messages.append("Wrote integrity values to {}.".format(path))
+    with timed_phase("precompress"):
+        paths = current_webpack.precompress()
+    if paths is not None:
+        messages.append("Precompressed {} files.".format(len(paths)))
+    if compile_manifest:
+        with timed_phase("compile-manifest"):
+            path = current_webpack.compile_manifest()
+        if path:
+            messages.append("Compiled manifest to {}.".format(path))
+    return messages
+
+
+def _after_build(compile_manifest):
+    for message in _post_build(compile_manifest):
+        click.secho(message, fg="green")
+
+
+compile_manifest_option = click.option(
+    "--compile-manifest",
+    is_flag=True,
+    default=False,
+    help="Compile the manifest for the CompiledManifestLoader after building.",
+)
+
+
+timeout_option = click.option(
+    "--timeout",
+    type=click.FloatRange(min=0, min_open=True),
+    default=None,
+    help="Seconds after which the NPM script is stopped.",
+)
+
+
+def _run_script(project, script, args, timeout):
+    """Run an NPM script of the project, streaming its output.
+
+    The build script is run by the ``build`` method of the project and other
+    scripts by its ``run`` method, so that projects can override them.
+    Projects which do not support streaming (e.g. plain pywebpack projects)
+    run the script without streaming its output and without timeout.
+
+    Exits with the exit status of the script if it fails, or with status
+    124 if it does not finish within ``timeout`` seconds.
+    """
+    kwargs = {}
+    if isinstance(project, _ScriptMixin):
+        kwargs = dict(output=lambda line: click.echo(line, nl=False), timeout=timeout)
+    elif timeout is not None:
+        click.secho("The project does not support --timeout, ignored.", fg="yellow")
+    try:
+        if script == "build":
+            project.build(*args, **kwargs)
+            status = 0
+        else:
+            status = exit_status(project.run(script, *args, **kwargs))
+    except ScriptTimeout as e:
+        click.secho(str(e), fg="red", err=True)
+        raise click.exceptions.Exit(124)
+    except ScriptError as e:
+        status = e.status
+    if status != 0:
+        click.secho(
+            'NPM script "{}" exited with status {}.'.format(script, status),
+            fg="red",
+            err=True,
+        )
+        raise click.exceptions.Exit(status)
 
 
 @webpack.command(context_settings={"ignore_unknown_options": True})
+@compile_manifest_option
+@timeout_option
 @click.argument("args", nargs=-1, type=click.UNPROCESSED)
 @with_appcontext
-def build(args):
+def build(compile_manifest, timeout, args):
     """Run NPM build-script."""
-    current_webpack.project.build(*args)
-    click.secho("Built webpack project.", fg="green")
+
+    def step(project):
+        with timed_phase("build"):
+            _run_script(project, "build", args, timeout)
+        click.secho("Built webpack project.", fg="green")
+
+    # The output depends on the arguments, which are not part of the inputs.
+    return _plan(
+        _Step("build", step, not args, partial(_after_build, compile_manifest))
+    )
 
 
 @webpack.command()
+@compile_manifest_option
+@jobs_option
+@click.option(
+    "--force-install",
+    is_flag=True,
+    default=False,
+    help="Install even if the dependencies did not change.",
+)
 @with_appcontext
-def buildall():
+def buildall(compile_manifest, jobs, force_install):
     """Create, install and build webpack project."""
-    current_webpack.project.buildall()
-    click.secho("Created, installed and built webpack project.", fg="green")
+
+    def step(project):
+        with timed_phase("buildall"):
+            if hasattr(project, "install_skipped"):
+                project.buildall(force_install=force_install, jobs=jobs)
+            else:
+                project.buildall()
+        if getattr(project, "build_cache_hit", False):
+            click.secho("Restored webpack project build from cache.", fg="green")
+        else:
+            click.secho("Created, installed and built webpack project.", fg="green")
+
+    return _plan(
+        _Step("buildall", step, False, partial(_after_build, compile_manifest))
+    )
 
 
 @webpack.command(context_settings={"ignore_unknown_options": True})
+@timeout_option
 @click.argument("script")
 @click.argument("args", nargs=-1, type=click.UNPROCESSED)
 @with_appcontext
-def run(script, args):
+def run(timeout, script, args):
     """Run an NPM script."""
-    try:
-        current_webpack.project.run(script, *args)
+
+    def step(project):
+        scripts = project.npmpkg.package_json.get("scripts", {})
+        if script not in scripts:
+            raise click.BadParameter('"{}" is not a valid NPM script.'.format(script))
+        with timed_phase("run"):
+            _run_script(project, script, args, timeout)
         click.secho('Executed NPM script "{}".'.format(script), fg="green")
-    except RuntimeError:
-        raise click.BadParameter('"{}" is not a valid NPM script.'.format(script))
+
+    return _plan(_Step("run", step, False))
+
+
+def _forward_output(process):
+    for line in iter(process.stdout.readline, b""):
+        click.echo(line.decode(errors="replace"), nl=False)
+
+
+@webpack.command()
+@click.option(
+    "--script",
+    default="watch",
+    show_default=True,
+    help="NPM script to run while watching. Skipped if it does not exist.",
+)
+@click.option(
+    "--poll",
+    is_flag=True,
+    default=False,
+    help="Poll for changes instead of using watchdog.",
+)
+@click.option(
+    "--interval",
+    type=float,
+    default=1.0,
+    show_default=True,
+    help="Seconds between two scans when polling.",
+)
+@click.option(
+    "--debounce",
+    type=float,
+    default=0.2,
+    show_default=True,
+    help="Seconds without changes to wait before syncing.",
+)
+@with_appcontext
+def watch(script, poll, interval, debounce):
+    """Sync changed source files into the project and run NPM watch-script."""
+    return _plan(
+        _Step(
+            "watch",
+            partial(
+                _watch, script=script, poll=poll, interval=interval, debounce=debounce
+            ),
+            False,
+        )
+    )
+
+
+def _watch(project, script, poll, interval, debounce):
+    if not hasattr(project, "source_folders"):
+        click.secho("Nothing to do for project.", fg="yellow")
+        return
+
+    project.create()
+    watcher = ProjectWatcher(project, debounce=debounce, interval=interval, poll=poll)
+
+    process = None
+    if script in project.npmpkg.package_json.get("scripts", {}):
+        process = project.npmpkg.run_script(script, wait=False)
+        threading.Thread(target=_forward_output, args=(process,), daemon=True).start()
+    else:
+        click.secho(
+            'No NPM script "{}", only syncing files.'.format(script), fg="yellow"
+        )
+
+    click.secho(
+        "Watching {} folders for changes.".format(len(watcher.folders)), fg="green"
+    )
+    try:
+        watcher.run(
+            callback=lambda synced: click.echo("Synced: {}".format(", ".join(synced))),
+            stop=lambda: process is not None and process.poll() is not None,
+        )
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if process is not None and process.poll() is None:
+            process.terminate()
+            process.wait()
+
+
+def _buildall_app(app_import_path, npm_cache=None, compile_manifest=False):
+    """Create, install and build the webpack project of an application.
+
+    The post-build steps of ``flask webpack buildall`` are run as well.
+
+    :returns: Tuple of the duration, the messages of the post-build steps
+        and the timing summary of the phases.
+    """
+    if npm_cache:
+        os.environ["npm_config_cache"] = npm_cache
+    start = time.monotonic()
+    recorder = start_timings()
+    try:
+        app = ScriptInfo(app_import_path=app_import_path).load_app()
+        with app.app_context():
+            current_webpack.project.buildall()
+            messages = _post_build(compile_manifest)
+    finally:
+        stop_timings()
+    return time.monotonic() - start, messages, recorder.summary()
+
+
+@click.command("webpack-buildapps")
+@click.argument("apps", nargs=-1, required=True)
+@click.option(
+    "--processes",
+    "-p",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Number of concurrent builds. By default the number of CPUs.",
+)
+@click.option(
+    "--npm-cache",
+    type=click.Path(file_okay=False),
+    default=None,
+    help="NPM cache directory shared by all builds.",
+)
+@compile_manifest_option
+def buildapps(apps, processes, npm_cache, compile_manifest):
+    """Create, install and build the webpack projects of several applications.
+
+    Each of APPS is an import path of a Flask application or application
+    factory, as accepted by ``flask --app``. The duration of the phases of
+    each build is printed.
+    """
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [
+            executor.submit(_buildall_app, app, npm_cache, compile_manifest)
+            for app in apps
+        ]
+        results = []
+        for app, future in zip(apps, futures):
+            try:
+                results.append((app, future.result(), None))
+            except Exception as e:
+                results.append((app, None, e))
+
+    failed = False
+    for app, result, error in results:
+        if error is None:
+            duration, messages, summary = result
+            click.secho("{}: built in {:.1f}s".format(app, duration), fg="green")
+            for line in messages + summary:
+                click.echo("  " + line)
+        else:
+            failed = True
+            click.secho("{}: failed: {}".format(app, error), fg="red")
+    if failed:
+        raise click.ClickException("Some webpack projects failed to build.")
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Flask-WebpackExt
+# Copyright (C) 2026 CERN.
+#
+# Flask-WebpackExt is free software; you can redistribute it and/or modify
+# it under the terms of the Revised BSD License; see LICENSE file for
+# more details.
+
+"""Precompressed (gzip and brotli) variants of the files of a manifest.
+
+Brotli variants require `brotli`_ (``pip install flask-webpackext[compress]``)
+and are skipped if it is not installed.
+
+.. _brotli: https://pypi.org/project/Brotli/
+"""
+
+import gzip
+import os
+from concurrent.futures import ThreadPoolExecutor
+from os.path import exists
+
+from .helpers import atomic_write
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+SUFFIXES = {
+    "br": ".br",
+    "gzip": ".gz",
+}
+"""File name suffix of the compressed variants per content encoding."""
+
+
+def available_encodings(encodings):
+    """Get the encodings which can be produced, in the given order."""
+    return [e for e in encodings if e in SUFFIXES and (e != "br" or brotli)]
+
+
+def compressed_path(path, encoding):
+    """Get the path of the compressed variant of a file."""
+    return path + SUFFIXES[encoding]
+
+
+def is_fresh(path, compressed):
+    """Check if a compressed variant exists and is not older than the file."""
+    try:
+        return os.stat(compressed).st_mtime_ns >= os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return False
+
+
+def compress_file(path, encoding):
+    """Write the compressed variant of a file, unless it is up to date.
+
+    :returns: ``True`` if the compressed variant was written.
+    """
+    output_path = compressed_path(path, encoding)
+    if is_fresh(path, output_path):
+        return False
+    with open(path, "rb") as fp:
+        data = fp.read()
+    if encoding == "br":
+        data = brotli.compress(data)
+    else:
+        data = gzip.compress(data, compresslevel=9, mtime=0)
+    with atomic_write(output_path) as fp:
+        fp.write(data)
+    return True
+
+
+def precompress(paths, encodings=("br", "gzip"), workers=None):
+    """Write the compressed variants of files.
+
+    Files are compressed concurrently by ``workers`` threads (by default one
+    per CPU), as zlib and brotli release the GIL while compressing. Variants
+    which are not older than their file are kept.
+
+    :param paths: Paths of the files to compress.
+    :param encodings: Content encodings of the variants (``br``, ``gzip``).
+    :param workers: Number of threads.
+    :returns: List of the paths of the written variants.
+    """
+    tasks = [
+        (path, encoding)
+        for path in paths
+        if exists(path)
+        for encoding in available_encodings(encodings)
+    ]
+    if not tasks:
+        return []
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        written = list(executor.map(lambda t: compress_file(*t), tasks))
+    return [compressed_path(*t) for t, w in zip(tasks, written) if w]
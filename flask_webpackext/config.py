@@ -12,11 +12,84 @@
 
 WEBPACKEXT_MANIFEST_LOADER = None
 """Manifest loader use to load manifest. By default ``JinjaManifestLoader``.
+
+For large manifests use ``flask_webpackext.manifest.LazyJinjaManifestLoader``
+which only creates the entries that are used. For very large manifests use
+``flask_webpackext.manifest.CompiledManifestLoader`` together with
+``flask webpack build --compile-manifest``.
+"""
+
+WEBPACKEXT_BUILD_CACHE_DIR = None
+"""Directory where the outputs of ``flask webpack buildall`` are cached by a
+fingerprint of the build inputs. When the inputs did not change, the output is
+restored from the cache instead of running webpack. Disabled by default.
+"""
+
+WEBPACKEXT_COPY_WORKERS = 1
+"""Number of threads used to copy the bundles of a ``WebpackBundleProject``
+into the build directory.
+"""
+
+WEBPACKEXT_EARLY_HINTS_HANDLER = None
+"""Callable (or import string) used to send ``103 Early Hints`` responses on
+servers which support them. It is called before a request is handled with the
+list of ``Link`` header values which were sent by the last response of the
+same endpoint. Requires ``WEBPACKEXT_PRELOAD_HEADERS``.
+"""
+
+WEBPACKEXT_HASHED_FILENAME_PATTERN = r"[.\-_]([0-9a-fA-F]{8,})\."
+"""Regular expression matching the content hash in the name of a file built
+by webpack (e.g. ``[name].[contenthash].js``). The first group is the hash.
+"""
+
+WEBPACKEXT_IMMUTABLE_MAX_AGE = 31536000
+"""Max age in seconds of the files of the manifest with a content hash in their
+name when served by the view registered with ``WEBPACKEXT_SERVE_DIST``. They
+are sent as ``immutable``, with a strong ETag derived from the hash. Set to
+``None`` to send them with the default headers of the application.
+"""
+
+WEBPACKEXT_INSTALL_SKIP_UNCHANGED = True
+"""Skip ``flask webpack install`` when ``node_modules`` exists and neither
+``package.json`` (including the bundle dependencies) nor the lockfiles changed
+since the last installation. Use ``--force-install`` to install anyway.
+"""
+
+WEBPACKEXT_MANIFEST_CACHE_SIZE = 16
+"""Maximum number of loaded manifests cached per application. Least recently
+used manifests are evicted first. ``None`` disables the limit.
 """
 
 WEBPACKEXT_MANIFEST_PATH = "dist/manifest.json"
 """Path to manifest file relative to static folder."""
 
+WEBPACKEXT_MANIFEST_PRELOAD = False
+"""Load the manifest when the extension is initialized instead of on the first
+request using it. Useful with pre-forking servers (e.g. gunicorn with
+``--preload``) so that workers share the already loaded manifest.
+"""
+
+WEBPACKEXT_MANIFEST_RELOAD_INTERVAL = 0
+"""Minimum time in milliseconds between two checks for a modified manifest
+file in debug mode. By default the file is checked on every lookup.
+"""
+
+WEBPACKEXT_PRELOAD_HEADERS = False
+"""Add ``Link: <...>; rel=preload`` headers to responses for the JavaScript and
+CSS files of the manifest entries included in the rendered templates.
+"""
+
+WEBPACKEXT_PRECOMPRESS = False
+"""Write compressed variants (``.br`` and ``.gz`` files) of the files of the
+manifest in ``WEBPACKEXT_PROJECT_DISTDIR`` after ``flask webpack build`` and
+``flask webpack buildall``. Brotli requires ``pip install
+flask-webpackext[compress]``.
+"""
+
+WEBPACKEXT_PRECOMPRESS_ENCODINGS = ("br", "gzip")
+"""Content encodings of the compressed variants, in order of preference when
+serving them."""
+
 WEBPACKEXT_PROJECT = None
 """Webpack project."""
 
@@ -34,6 +107,35 @@ WEBPACKEXT_PROJECT_DISTURL = None
 """URL path to where Webpack output files are accessible. By default ``dist``.
 """
 
+WEBPACKEXT_SERVE_DIST = False
+"""Register a view serving ``WEBPACKEXT_PROJECT_DISTDIR`` under
+``WEBPACKEXT_PROJECT_DISTURL``, which sends the compressed variant of a file
+accepted by the client if it exists. The view takes precedence over the static
+view of the application.
+"""
+
+WEBPACKEXT_SUBRESOURCE_INTEGRITY = False
+"""Add ``integrity`` attributes to the script and link tags of the files in
+``WEBPACKEXT_PROJECT_DISTDIR``. The values are written next to the manifest by
+``flask webpack build`` and ``flask webpack buildall``. If they are missing or
+outdated, they are computed once when the manifest is loaded.
+"""
+
+WEBPACKEXT_SUBRESOURCE_INTEGRITY_ALGORITHM = "sha384"
+"""Hash algorithm used for Subresource Integrity."""
+
 WEBPACKEXT_STORAGE_CLS = None
 """Default storage class. By default ``FileStorage``.
+
+Use ``flask_webpackext.storage.IncrementalFileStorage`` to only copy new and
+changed files in ``flask webpack create``, or
+``flask_webpackext.storage.HardlinkStorage`` to link files instead of copying
+them.
+"""
+
+WEBPACKEXT_X_ACCEL_REDIRECT_PREFIX = None
+"""Internal location of ``WEBPACKEXT_PROJECT_DISTDIR`` in nginx. If set, the
+view registered with ``WEBPACKEXT_SERVE_DIST`` lets nginx send the files of the
+manifest with an ``X-Accel-Redirect`` header. ``USE_X_SENDFILE`` is honored
+as well.
 """
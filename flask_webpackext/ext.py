@@ -12,13 +12,28 @@
 
 from os.path import join
 
+from flask import g, request
 from pynpm.package import NPMPackage
 from pywebpack import FileStorage
 from werkzeug.utils import import_string
 
 from . import config
-from .manifest import JinjaManifestLoader
+from .compress import precompress
+from .integrity import (
+    integrity_path,
+    load_integrity,
+    manifest_files,
+    write_integrity,
+)
+from .manifest import (
+    JinjaManifestLoader,
+    ManifestCache,
+    _CachedManifest,
+    compile_manifest,
+    preload_links,
+)
 from .proxies import current_manifest
+from .views import build_static_index, dist_view
 
 
 class FlaskWebpackExt(object):
@@ -33,7 +48,19 @@ class FlaskWebpackExt(object):
         """Flask application initialization."""
         self.init_config(app)
         app.add_template_global(current_manifest, name="webpack")
-        app.extensions["flask-webpackext"] = _FlaskWebpackExtState(app)
+        state = _FlaskWebpackExtState(app)
+        app.extensions["flask-webpackext"] = state
+        app.before_request(state.before_request)
+        app.after_request(state.after_request)
+        if app.config["WEBPACKEXT_MANIFEST_PRELOAD"]:
+            state.preload()
+        if app.config["WEBPACKEXT_SERVE_DIST"]:
+            app.add_url_rule(
+                app.config["WEBPACKEXT_PROJECT_DISTURL"].rstrip("/")
+                + "/<path:filename>",
+                "webpackext_dist",
+                dist_view,
+            )
 
     def init_config(self, app):
         """Initialize configuration."""
@@ -65,48 +92,236 @@ class FlaskWebpackExt(object):
 
 
 class _FlaskWebpackExtState(object):
-    """Flask webpack state object."""
+    """Flask webpack state object.
+
+    Configuration values are resolved (i.e. imported if given as import
+    strings) once and memoized. A memoized value is automatically discarded
+    when the underlying configuration value is replaced. Use :meth:`reload`
+    to force all values to be resolved again.
+    """
 
     def __init__(self, app):
         """Initialize state."""
         self.app = app
+        self._resolved = {}
+        self.manifest_cache = ManifestCache(
+            maxsize=app.config.get("WEBPACKEXT_MANIFEST_CACHE_SIZE")
+        )
+        self._endpoint_links = {}
+
+    def reload(self):
+        """Discard all memoized values and cached manifests."""
+        self._resolved.clear()
+        self.manifest_cache.clear()
+
+    def preload(self):
+        """Load the manifest ahead of the first request.
+
+        Allows the manifest to be parsed once in the master process of a
+        pre-forking server and shared with the workers. A missing manifest
+        file (e.g. assets not yet built) is logged and ignored, while an
+        invalid one raises.
+        """
+        with self.app.app_context():
+            try:
+                return self.manifest
+            except FileNotFoundError as e:
+                self.app.logger.warning("Could not preload manifest: %s", e)
+
+    def before_request(self):
+        """Start recording the manifest entries used by the request.
+
+        If an early hints handler is configured, it is called with the
+        preload links of the previous response of the same endpoint.
+        """
+        if not self.app.config["WEBPACKEXT_PRELOAD_HEADERS"]:
+            return
+        g._webpackext_used = []
+        handler = self._resolve("WEBPACKEXT_EARLY_HINTS_HANDLER")
+        if handler:
+            links = self._endpoint_links.get(request.endpoint)
+            if links:
+                handler(links)
+
+    def after_request(self, response):
+        """Add preload links for the manifest entries used by the request.
+
+        With Subresource Integrity, the links of the files which have an
+        integrity value carry it, see
+        :func:`~flask_webpackext.manifest.preload_links`.
+        """
+        used = g.pop("_webpackext_used", None)
+        if used:
+            links = preload_links(used, self.integrity)
+            self._endpoint_links[request.endpoint] = links
+            if links:
+                response.headers.add("Link", ", ".join(links))
+        return response
+
+    def _memoize(self, key, factory, name=None):
+        """Get a value derived from a configuration variable.
+
+        :param key: Name of the configuration variable.
+        :param factory: Callable which computes the value from the raw
+            configuration value. It is only called if the configuration value
+            changed since the last call.
+        :param name: Name under which the value is memoized. By default the
+            name of the configuration variable.
+        """
+        name = name or key
+        value = self.app.config[key]
+        try:
+            raw, resolved = self._resolved[name]
+            if raw is value:
+                return resolved
+        except KeyError:
+            pass
+        resolved = factory(value)
+        self._resolved[name] = (value, resolved)
+        return resolved
+
+    def _resolve(self, key):
+        """Get a configuration value, importing it if it is a string."""
+        return self._memoize(
+            key, lambda v: import_string(v) if isinstance(v, str) else v
+        )
 
     @property
     def manifest_loader(self):
         """Manifest loader."""
-        loader = self.app.config["WEBPACKEXT_MANIFEST_LOADER"]
-        if isinstance(loader, str):
-            return import_string(loader)
-        return loader
+        return self._resolve("WEBPACKEXT_MANIFEST_LOADER")
+
+    @property
+    def manifest_path(self):
+        """Absolute path to the manifest file."""
+        return self._memoize(
+            "WEBPACKEXT_MANIFEST_PATH",
+            lambda v: join(self.app.static_folder, v) if v else None,
+        )
 
     @property
     def manifest(self):
         """Manifest."""
-        path = self.app.config["WEBPACKEXT_MANIFEST_PATH"]
+        path = self.manifest_path
         if path:
-            return self.manifest_loader().load(join(self.app.static_folder, path))
+            loader = self._memoize(
+                "WEBPACKEXT_MANIFEST_LOADER",
+                lambda v: self.manifest_loader(),
+                name="manifest_loader_instance",
+            )
+            return loader.load(path)
         return None
 
+    def compile_manifest(self):
+        """Compile the manifest for the ``CompiledManifestLoader``.
+
+        :returns: Path of the compiled manifest, or ``None`` if no manifest
+            path is configured.
+        """
+        if self.manifest_path:
+            return compile_manifest(self.manifest_path)
+        return None
+
+    def _integrity_args(self):
+        return (
+            self.manifest_path,
+            self.manifest,
+            self.app.config["WEBPACKEXT_PROJECT_DISTDIR"],
+            self.app.config["WEBPACKEXT_PROJECT_DISTURL"],
+            self.app.config["WEBPACKEXT_SUBRESOURCE_INTEGRITY_ALGORITHM"],
+        )
+
+    @property
+    def integrity(self):
+        """Subresource Integrity values of the manifest files.
+
+        :returns: Dictionary mapping file URLs to integrity values, or
+            ``None`` if Subresource Integrity is disabled.
+        """
+        path = self.manifest_path
+        if not path or not self.app.config["WEBPACKEXT_SUBRESOURCE_INTEGRITY"]:
+            return None
+
+        def load(key):
+            signature = JinjaManifestLoader.file_signature(path)
+            return _CachedManifest(load_integrity(*self._integrity_args()), signature)
+
+        return self.manifest_cache.get_or_load(
+            integrity_path(path),
+            load,
+            lambda cached: JinjaManifestLoader._is_fresh(cached, path),
+        ).manifest
+
+    @property
+    def static_index(self):
+        """Static file index of the manifest files in the dist directory.
+
+        The index is cached with the manifest, i.e. it is rebuilt when the
+        manifest is reloaded.
+
+        :returns: Index built by
+            :func:`~flask_webpackext.views.build_static_index`, or ``None`` if
+            no manifest path is configured.
+        """
+        path = self.manifest_path
+        if not path:
+            return None
+
+        def load(key):
+            signature = JinjaManifestLoader.file_signature(path)
+            distdir = self.app.config["WEBPACKEXT_PROJECT_DISTDIR"]
+            files = manifest_files(
+                self.manifest, distdir, self.app.config["WEBPACKEXT_PROJECT_DISTURL"]
+            )
+            index = build_static_index(
+                files, distdir, self.app.config["WEBPACKEXT_HASHED_FILENAME_PATTERN"]
+            )
+            return _CachedManifest(index, signature)
+
+        return self.manifest_cache.get_or_load(
+            ("static_index", path),
+            load,
+            lambda cached: JinjaManifestLoader._is_fresh(cached, path),
+        ).manifest
+
+    def write_integrity(self):
+        """Write the Subresource Integrity values of the manifest files.
+
+        :returns: Path of the written file, or ``None`` if Subresource
+            Integrity is disabled.
+        """
+        if self.manifest_path and self.app.config["WEBPACKEXT_SUBRESOURCE_INTEGRITY"]:
+            return write_integrity(*self._integrity_args())
+        return None
+
+    def precompress(self):
+        """Write the compressed variants of the manifest files.
+
+        :returns: List of the paths of the written variants, or ``None`` if
+            precompression is disabled.
+        """
+        if not self.manifest_path or not self.app.config["WEBPACKEXT_PRECOMPRESS"]:
+            return None
+        files = manifest_files(
+            self.manifest,
+            self.app.config["WEBPACKEXT_PROJECT_DISTDIR"],
+            self.app.config["WEBPACKEXT_PROJECT_DISTURL"],
+        )
+        return precompress(
+            files.values(), self.app.config["WEBPACKEXT_PRECOMPRESS_ENCODINGS"]
+        )
+
     @property
     def project(self):
         """Webpack project."""
-        project = self.app.config["WEBPACKEXT_PROJECT"]
-        if isinstance(project, str):
-            return import_string(project)
-        return project
+        return self._resolve("WEBPACKEXT_PROJECT")
 
     @property
     def storage_cls(self):
         """Default storage class."""
-        cls_ = self.app.config["WEBPACKEXT_STORAGE_CLS"]
-        if isinstance(cls_, str):
-            return import_string(cls_)
-        return cls_
+        return self._resolve("WEBPACKEXT_STORAGE_CLS")
 
     @property
     def npm_pkg_cls(self):
         """Default JS package manager class."""
-        cls_ = self.app.config["WEBPACKEXT_NPM_PKG_CLS"]
-        if isinstance(cls_, str):
-            return import_string(cls_)
-        return cls_
+        return self._resolve("WEBPACKEXT_NPM_PKG_CLS")
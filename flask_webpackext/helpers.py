@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Flask-WebpackExt
+# Copyright (C) 2026 CERN.
+#
+# Flask-WebpackExt is free software; you can redistribute it and/or modify
+# it under the terms of the Revised BSD License; see LICENSE file for
+# more details.
+
+"""File helpers shared by the modules of Flask-WebpackExt."""
+
+import hashlib
+import os
+import threading
+from contextlib import contextmanager
+
+
+@contextmanager
+def atomic_write(path, mode="wb"):
+    """Open a temporary file which replaces ``path`` once it is written.
+
+    Readers (e.g. a webpack watcher, or processes which have the previous
+    file mapped) never see a partially written file. The temporary file is
+    removed if writing fails.
+
+    :param path: Path of the file to write.
+    :param mode: Mode in which the temporary file is opened (``"wb"`` or
+        ``"w"``).
+    """
+    tmp_path = "{}.{}.{}.tmp".format(path, os.getpid(), threading.get_ident())
+    try:
+        with open(tmp_path, mode) as fp:
+            yield fp
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def file_digest(path, algorithm="sha256", chunk_size=64 * 1024):
+    """Compute the digest of a file.
+
+    The file is read in chunks, so that large files are not loaded in memory.
+
+    :param algorithm: Name of a hash algorithm of :mod:`hashlib`.
+    :returns: The hash object.
+    """
+    digest = hashlib.new(algorithm)
+    with open(path, "rb") as fp:
+        for chunk in iter(lambda: fp.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest
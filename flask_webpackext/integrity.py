@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Flask-WebpackExt
+# Copyright (C) 2026 CERN.
+#
+# Flask-WebpackExt is free software; you can redistribute it and/or modify
+# it under the terms of the Revised BSD License; see LICENSE file for
+# more details.
+
+"""Subresource Integrity hashes for the files of a manifest."""
+
+import base64
+import json
+import os
+from os.path import join, splitext
+
+from .helpers import atomic_write, file_digest
+
+
+def integrity_path(filepath):
+    """Get the path of the integrity file of a manifest file."""
+    return splitext(filepath)[0] + ".integrity.json"
+
+
+def file_integrity(filepath, algorithm="sha384", chunk_size=64 * 1024):
+    """Compute the Subresource Integrity value of a file.
+
+    The file is read in chunks, so that large files are not loaded in memory.
+    """
+    digest = file_digest(filepath, algorithm, chunk_size)
+    return "{}-{}".format(algorithm, base64.b64encode(digest.digest()).decode("ascii"))
+
+
+def manifest_files(manifest, distdir, disturl):
+    """Get the files of a manifest which are located in the dist directory.
+
+    :param manifest: Loaded manifest, as returned by the manifest loaders.
+    :param distdir: Directory where the files of the manifest are located.
+    :param disturl: URL path under which ``distdir`` is served. Files with
+        other URLs (e.g. on a CDN) are skipped.
+    :returns: Dictionary mapping file URLs to paths.
+    """
+    prefix = disturl.rstrip("/") + "/"
+    files = {}
+    for entry in manifest:
+        for url in entry:
+            if url not in files and url.startswith(prefix):
+                files[url] = join(distdir, url[len(prefix) :])
+    return files
+
+
+def compute_integrity(manifest, distdir, disturl, algorithm="sha384"):
+    """Compute the integrity values of all files in a manifest.
+
+    :param manifest: Loaded manifest, as returned by the manifest loaders.
+    :param distdir: Directory where the files of the manifest are located.
+    :param disturl: URL path under which ``distdir`` is served. Files with
+        other URLs (e.g. on a CDN) are skipped.
+    :param algorithm: Hash algorithm (``sha256``, ``sha384`` or ``sha512``).
+    :returns: Dictionary mapping file URLs to integrity values. Files which
+        do not exist are skipped.
+    """
+    values = {}
+    for url, path in manifest_files(manifest, distdir, disturl).items():
+        try:
+            values[url] = file_integrity(path, algorithm)
+        except FileNotFoundError:
+            continue
+    return values
+
+
+def _manifest_stat(filepath):
+    st = os.stat(filepath)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def write_integrity(filepath, manifest, distdir, disturl, algorithm="sha384"):
+    """Compute the integrity values of a manifest and write them to a file.
+
+    The size and modification time of the manifest are recorded, so that
+    :func:`load_integrity` can detect an outdated file.
+
+    :param filepath: Path to the manifest file.
+    :param manifest: Manifest loaded from ``filepath``. See
+        :func:`compute_integrity` for the other parameters.
+    :returns: Path of the integrity file.
+    """
+    output_path = integrity_path(filepath)
+    data = {
+        "algorithm": algorithm,
+        "manifest": _manifest_stat(filepath),
+        "files": compute_integrity(manifest, distdir, disturl, algorithm),
+    }
+    with atomic_write(output_path, "w") as fp:
+        json.dump(data, fp, indent=2, sort_keys=True)
+    return output_path
+
+
+def load_integrity(filepath, manifest, distdir, disturl, algorithm="sha384"):
+    """Load the integrity values of a manifest.
+
+    Values are read from the file written by :func:`write_integrity`. If it
+    does not exist or is outdated, they are computed from the files.
+
+    :param filepath: Path to the manifest file.
+    :param manifest: Manifest loaded from ``filepath``. See
+        :func:`compute_integrity` for the other parameters.
+    :returns: Dictionary mapping file URLs to integrity values.
+    """
+    try:
+        with open(integrity_path(filepath)) as fp:
+            data = json.load(fp)
+        if data["algorithm"] == algorithm and data["manifest"] == _manifest_stat(
+            filepath
+        ):
+            return data["files"]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return compute_integrity(manifest, distdir, disturl, algorithm)
@@ -10,12 +10,65 @@
 
 """Proxy to current extension."""
 
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from os.path import splitext
 
-from flask import current_app
+from flask import current_app, g, has_app_context
 from markupsafe import Markup
-from pywebpack import Manifest, ManifestEntry, ManifestLoader
+from pywebpack import (
+    Manifest,
+    ManifestEntry,
+    ManifestLoader,
+    UnsupportedExtensionError,
+)
 
 from .errors import ManifestKeyNotFoundError
+from .helpers import atomic_write
+from .proxies import current_webpack
+
+PRELOAD_TYPES = {
+    ".js": "script",
+    ".css": "style",
+}
+"""Value of the ``as`` attribute of preload links per file extension."""
+
+
+def preload_links(paths, integrity=None):
+    """Build ``Link`` header values which preload the given files.
+
+    Duplicated files and files of unknown type are skipped.
+
+    :param integrity: Dictionary mapping file URLs to Subresource Integrity
+        values. Files which have one are preloaded with the same
+        ``integrity`` and ``crossorigin`` attributes as their tags, so that
+        the browser reuses the preloaded response.
+    """
+    links = []
+    seen = set()
+    for path in paths:
+        as_ = PRELOAD_TYPES.get(splitext(path)[1].lower())
+        if as_ and path not in seen:
+            seen.add(path)
+            link = "<{}>; rel=preload; as={}".format(path, as_)
+            if integrity and path in integrity:
+                link += '; integrity="{}"; crossorigin=anonymous'.format(
+                    integrity[path]
+                )
+            links.append(link)
+    return links
+
+
+def _record_used(paths):
+    """Record files included in the current request, if requested."""
+    if has_app_context():
+        used = g.get("_webpackext_used")
+        if used is not None:
+            used.extend(paths)
 
 
 class JinjaManifest(Manifest):
@@ -38,26 +91,467 @@ class JinjaManifest(Manifest):
             msg = f"Key {name} not found in manifest.json"
             raise ManifestKeyNotFoundError(msg)
 
+    def require(self, *names):
+        """Collect entries to be rendered by :meth:`render_collected`.
+
+        Entries are collected for the current request only. Requiring an
+        entry more than once has no effect. Returns an empty string so that
+        it can be used as ``{{ webpack.require('app.js') }}``.
+        """
+        collected = g.setdefault("_webpackext_collected", {})
+        for name in names:
+            collected.setdefault(name, self[name])
+        return ""
+
+    def render_collected(self):
+        """Render all entries collected with :meth:`require`.
+
+        Entries are rendered in the order they were first required, and each
+        file (e.g. a chunk shared by several entries) is only included once
+        per request, even across several calls.
+        """
+        collected = g.pop("_webpackext_collected", {})
+        emitted = g.setdefault("_webpackext_emitted", set())
+        out = []
+        for entry in collected.values():
+            for path in entry:
+                if path not in emitted:
+                    emitted.add(path)
+                    out.append(entry.render_path(path))
+                    _record_used((path,))
+        return Markup("".join(out))
+
 
 class JinjaManifestEntry(ManifestEntry):
     """Manifest entry which marks rendered strings as safe for Jinja."""
 
+    integrity_templates = {
+        ".js": '<script src="{}" integrity="{}" crossorigin="anonymous"></script>',
+        ".css": (
+            '<link rel="stylesheet" href="{}" integrity="{}" '
+            'crossorigin="anonymous" />'
+        ),
+    }
+    """Templates used for files with a Subresource Integrity value."""
+
+    _html = None
+
+    @staticmethod
+    def _integrity():
+        """Get the Subresource Integrity values of the current application."""
+        return current_webpack.integrity if has_app_context() else None
+
+    def render_path(self, path):
+        """Render a single file of the entry.
+
+        The ``integrity`` attribute is added if Subresource Integrity is
+        enabled and the value of the file is known.
+        """
+        _, ext = splitext(path)
+        ext = ext.lower()
+        integrity = self._integrity()
+        if integrity and path in integrity and ext in self.integrity_templates:
+            return self.integrity_templates[ext].format(path, integrity[path])
+        tpl = self.templates.get(ext)
+        if tpl is None:
+            raise UnsupportedExtensionError(path)
+        return tpl.format(path)
+
+    def render(self):
+        """Render entry."""
+        return "".join(self.render_path(p) for p in self._paths)
+
     def __html__(self):
-        """Ensures that string is not escaped when included in Jinja."""
-        return Markup(self.render())
+        """Ensures that string is not escaped when included in Jinja.
+
+        The entry is rendered on first use only, as its paths never change.
+        A reloaded manifest creates new entries. The rendered entry is kept
+        together with the integrity values it was rendered with, and rendered
+        again once they are reloaded, enabled or disabled.
+        """
+        integrity = self._integrity()
+        if self._html is None or self._html[0] is not integrity:
+            self._html = (integrity, Markup(self.render()))
+        _record_used(self._paths)
+        return self._html[1]
+
+
+class ManifestCache(object):
+    """Bounded and thread-safe cache of loaded manifests.
+
+    The least recently used manifest is evicted once more than ``maxsize``
+    manifests are cached. Concurrent loads of the same key are serialized so
+    that a manifest file is parsed only once.
+    """
+
+    def __init__(self, maxsize=None):
+        """Initialize cache.
+
+        :param maxsize: Maximum number of cached manifests. ``None`` means
+            unbounded.
+        """
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._key_locks = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Number of cached manifests."""
+        return len(self._entries)
+
+    def __contains__(self, key):
+        """Check if a key is cached."""
+        return key in self._entries
+
+    def get(self, key):
+        """Get a cached value or ``None``."""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        """Cache a value, evicting the least recently used ones if needed."""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while self.maxsize is not None and len(self._entries) > self.maxsize:
+                evicted, _ = self._entries.popitem(last=False)
+                self._key_locks.pop(evicted, None)
+
+    def clear(self):
+        """Remove all cached values."""
+        with self._lock:
+            self._entries.clear()
+            self._key_locks.clear()
+
+    def get_or_load(self, key, load, is_fresh=None):
+        """Get a cached value or load it.
+
+        :param key: Cache key.
+        :param load: Callable which loads the value for a key.
+        :param is_fresh: Optional callable which receives a cached value and
+            returns ``False`` if the value must be loaded again.
+        """
+        value = self.get(key)
+        if value is not None and (is_fresh is None or is_fresh(value)):
+            return value
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            # Another thread may have loaded the value in the meantime.
+            value = self.get(key)
+            if value is not None and (is_fresh is None or is_fresh(value)):
+                return value
+            value = load(key)
+            self.set(key, value)
+            return value
+
+
+class _CachedManifest(object):
+    """Loaded manifest together with the signature of its file."""
+
+    __slots__ = ("manifest", "signature", "checked_at")
+
+    def __init__(self, manifest, signature):
+        self.manifest = manifest
+        self.signature = signature
+        self.checked_at = time.monotonic()
 
 
 class JinjaManifestLoader(ManifestLoader):
-    """Factory which uses the Jinja manifest entry."""
+    """Factory which uses the Jinja manifest entry.
 
-    cache = {}
+    Loaded manifests are cached in the
+    :class:`~flask_webpackext.manifest.ManifestCache` of the current
+    application. In debug mode the manifest file is checked with a single
+    ``os.stat`` call and only re-parsed when its inode, size or modification
+    time changed. The check can be throttled with
+    ``WEBPACKEXT_MANIFEST_RELOAD_INTERVAL``.
+    """
 
     def __init__(self, manifest_cls=JinjaManifest, entry_cls=JinjaManifestEntry):
         """Initialize manifest loader."""
         super().__init__(manifest_cls=manifest_cls, entry_cls=entry_cls)
 
+    @staticmethod
+    def file_signature(filepath):
+        """Get a signature which changes when the file is rewritten."""
+        st = os.stat(filepath)
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def _load_cached(self, filepath):
+        """Load a manifest together with the signature of its file."""
+        signature = self.file_signature(filepath)
+        return _CachedManifest(super().load(filepath), signature)
+
+    @classmethod
+    def _is_fresh(cls, cached, filepath):
+        """Check if a cached manifest is still up to date."""
+        if not current_app.debug:
+            return True
+        now = time.monotonic()
+        interval = current_app.config.get("WEBPACKEXT_MANIFEST_RELOAD_INTERVAL")
+        if interval and (now - cached.checked_at) * 1000 < interval:
+            return True
+        if cls.file_signature(filepath) != cached.signature:
+            return False
+        cached.checked_at = now
+        return True
+
     def load(self, filepath):
-        """Load a manifest from a file."""
-        if current_app.debug or filepath not in JinjaManifestLoader.cache:
-            JinjaManifestLoader.cache[filepath] = super().load(filepath)
-        return JinjaManifestLoader.cache[filepath]
+        """Load a manifest from a file.
+
+        Manifests are cached per loader class, as each loader creates
+        different manifest and entry objects.
+        """
+        return current_webpack.manifest_cache.get_or_load(
+            (type(self), filepath),
+            lambda key: self._load_cached(filepath),
+            lambda cached: self._is_fresh(cached, filepath),
+        ).manifest
+
+
+#
+# Lazy manifests
+#
+_RawManifestEntry = namedtuple("_RawManifestEntry", ["name", "paths"])
+"""Entry name and paths, as created by the manifest factories."""
+
+
+class _LazyManifestEntries(dict):
+    """Entries of a lazy manifest, created on first access."""
+
+    def __init__(self, entry_cls):
+        super().__init__()
+        self.raw = {}
+        self._entry_cls = entry_cls
+
+    def __missing__(self, key):
+        """Create the entry from its raw paths."""
+        entry = self._entry_cls(key, self.raw[key])
+        self[key] = entry
+        return entry
+
+
+class LazyJinjaManifest(JinjaManifest):
+    """Manifest which only creates entries when they are accessed.
+
+    Only the entry paths are kept when the manifest is loaded. Entry objects
+    are created (and then reused) on first access, which reduces the load
+    time and memory usage of large manifests.
+    """
+
+    entry_cls = JinjaManifestEntry
+    """Class of the created manifest entries."""
+
+    def __init__(self):
+        """Initialize manifest."""
+        super().__init__()
+        self._entries = _LazyManifestEntries(self.entry_cls)
+
+    def add(self, entry):
+        """Add an entry (or its name and paths) to the manifest."""
+        if entry.name in self._entries.raw:
+            raise KeyError("Entry {} already present".format(entry.name))
+        if isinstance(entry, ManifestEntry):
+            self._entries[entry.name] = entry
+            self._entries.raw[entry.name] = list(entry)
+        else:
+            self._entries.raw[entry.name] = entry.paths
+
+    def __iter__(self):
+        """Iterate over entries in the manifest."""
+        for name in self._entries.raw:
+            yield self._entries[name]
+
+
+class LazyJinjaManifestLoader(JinjaManifestLoader):
+    """Loader which creates manifest entries on first access.
+
+    The entry class is taken from
+    :attr:`~flask_webpackext.manifest.LazyJinjaManifest.entry_cls`.
+    """
+
+    def __init__(self, manifest_cls=LazyJinjaManifest, entry_cls=_RawManifestEntry):
+        """Initialize manifest loader."""
+        super().__init__(manifest_cls=manifest_cls, entry_cls=entry_cls)
+
+
+#
+# Compiled manifests
+#
+_COMPILED_MAGIC = b"FWMF"
+_COMPILED_VERSION = 1
+# Magic, format version, number of entries, size and mtime (in ns) of the
+# source manifest file.
+_COMPILED_HEADER = struct.Struct("<4sIIQQ")
+# Offset and length of the entry name, offset and length of the paths.
+_COMPILED_RECORD = struct.Struct("<IIII")
+
+
+def compiled_manifest_path(filepath):
+    """Get the path of the compiled version of a manifest file."""
+    return splitext(filepath)[0] + ".bin"
+
+
+def compile_manifest(filepath, output_path=None):
+    """Compile a manifest into a compact binary file.
+
+    The compiled file holds a table of entry names sorted by their UTF-8
+    encoding followed by the entry names and paths, so that it can be
+    memory-mapped and searched without parsing it. The size and modification
+    time of the source manifest are recorded, so that an outdated compiled
+    file is detected.
+
+    :param filepath: Path to the manifest file. Any format supported by
+        :class:`pywebpack.manifests.ManifestLoader` can be used.
+    :param output_path: Path of the compiled file. By default the manifest
+        path with a ``.bin`` extension.
+    :returns: Path of the compiled file.
+    """
+    output_path = output_path or compiled_manifest_path(filepath)
+    st = os.stat(filepath)
+    items = sorted(
+        (entry.name.encode("utf-8"), "\0".join(entry).encode("utf-8"))
+        for entry in ManifestLoader().load(filepath)
+    )
+
+    records = []
+    data = []
+    offset = _COMPILED_HEADER.size + _COMPILED_RECORD.size * len(items)
+    for name, paths in items:
+        records.append(
+            _COMPILED_RECORD.pack(offset, len(name), offset + len(name), len(paths))
+        )
+        data.extend((name, paths))
+        offset += len(name) + len(paths)
+
+    # Replace the file atomically, so that processes which have the previous
+    # file mapped are not affected.
+    with atomic_write(output_path) as fp:
+        fp.write(
+            _COMPILED_HEADER.pack(
+                _COMPILED_MAGIC,
+                _COMPILED_VERSION,
+                len(items),
+                st.st_size,
+                st.st_mtime_ns,
+            )
+        )
+        fp.write(b"".join(records))
+        fp.write(b"".join(data))
+    return output_path
+
+
+class _CompiledManifestEntries(dict):
+    """Entries of a compiled manifest, created on first access."""
+
+    def __init__(self, buf, entry_cls):
+        super().__init__()
+        self._buf = buf
+        self._entry_cls = entry_cls
+        _, _, self._count, _, _ = _COMPILED_HEADER.unpack_from(buf)
+
+    def _record(self, index):
+        """Get the entry name and the paths location of a record."""
+        name_off, name_len, paths_off, paths_len = _COMPILED_RECORD.unpack_from(
+            self._buf, _COMPILED_HEADER.size + _COMPILED_RECORD.size * index
+        )
+        return self._buf[name_off : name_off + name_len], paths_off, paths_len
+
+    def _paths(self, offset, length):
+        return self._buf[offset : offset + length].decode("utf-8").split("\0")
+
+    def __missing__(self, key):
+        """Look the entry up with a binary search."""
+        name = key.encode("utf-8")
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            mid_name, paths_off, paths_len = self._record(mid)
+            if mid_name < name:
+                lo = mid + 1
+            elif mid_name > name:
+                hi = mid
+            else:
+                entry = self._entry_cls(key, self._paths(paths_off, paths_len))
+                self[key] = entry
+                return entry
+        raise KeyError(key)
+
+    def names(self):
+        """Iterate over all entry names in the compiled manifest."""
+        for index in range(self._count):
+            yield self._record(index)[0].decode("utf-8")
+
+
+class CompiledManifest(JinjaManifest):
+    """Manifest backed by a memory-mapped compiled manifest file.
+
+    Entries are looked up directly in the mapped file, so loading does not
+    depend on the manifest size and the pages are shared between processes.
+    """
+
+    def __init__(self, buf, entry_cls=JinjaManifestEntry):
+        """Initialize manifest.
+
+        :param buf: Buffer (usually a ``mmap``) with the compiled manifest.
+        :param entry_cls: Manifest entry class.
+        """
+        super().__init__()
+        self._entries = _CompiledManifestEntries(buf, entry_cls)
+
+    def __iter__(self):
+        """Iterate over entries in the manifest."""
+        for name in self._entries.names():
+            yield self._entries[name]
+
+
+class CompiledManifestLoader(JinjaManifestLoader):
+    """Loader which uses the compiled manifest if available.
+
+    The compiled file is created with :func:`compile_manifest` (e.g. by
+    ``flask webpack build --compile-manifest``). If it does not exist or is
+    outdated, the manifest file is parsed as usual.
+    """
+
+    def __init__(self, manifest_cls=CompiledManifest, entry_cls=JinjaManifestEntry):
+        """Initialize manifest loader."""
+        super().__init__(manifest_cls=manifest_cls, entry_cls=entry_cls)
+
+    def load_compiled(self, filepath):
+        """Map the compiled version of a manifest file.
+
+        :returns: The manifest, or ``None`` if there is no up-to-date
+            compiled file.
+        """
+        try:
+            with open(compiled_manifest_path(filepath), "rb") as fp:
+                buf = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            return None
+        st = os.stat(filepath)
+        try:
+            magic, version, _, size, mtime_ns = _COMPILED_HEADER.unpack_from(buf)
+        except struct.error:
+            magic = version = size = mtime_ns = None
+        if (magic, version, size, mtime_ns) != (
+            _COMPILED_MAGIC,
+            _COMPILED_VERSION,
+            st.st_size,
+            st.st_mtime_ns,
+        ):
+            buf.close()
+            return None
+        return self.manifest_cls(buf, entry_cls=self.entry_cls)
+
+    def _load_cached(self, filepath):
+        """Load the compiled manifest, falling back to the manifest file."""
+        signature = self.file_signature(filepath)
+        manifest = self.load_compiled(filepath)
+        if manifest is None:
+            loader = JinjaManifestLoader(entry_cls=self.entry_cls)
+            return loader._load_cached(filepath)
+        return _CachedManifest(manifest, signature)
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Flask-WebpackExt
+# Copyright (C) 2026 CERN.
+#
+# Flask-WebpackExt is free software; you can redistribute it and/or modify
+# it under the terms of the Revised BSD License; see LICENSE file for
+# more details.
+
+"""Run NPM scripts with streamed output, timeouts and signal propagation."""
+
+import os
+import signal
+import subprocess
+import threading
+import time
+from os.path import dirname
+
+from .timings import record
+
+FORWARDED_SIGNALS = (signal.SIGINT, signal.SIGTERM)
+"""Signals received while a script runs which are sent to its process
+group."""
+
+
+class ScriptTimeout(RuntimeError):
+    """NPM script did not finish in time."""
+
+
+class ScriptError(RuntimeError):
+    """NPM script exited with a non-zero status."""
+
+    def __init__(self, status):
+        """Initialize error.
+
+        :param status: Exit status of the script.
+        """
+        super().__init__("Process exited with code {}".format(status))
+        self.status = status
+
+
+def script_command(npmpkg, script_name, *args):
+    """Get the command line which runs an NPM script of a package."""
+    npm_bin = getattr(npmpkg, "_npm_bin", "npm")
+    return [npm_bin, "run-script", script_name] + list(args)
+
+
+def _signal_group(process, signum):
+    """Send a signal to the process group of a script."""
+    if process.poll() is not None:
+        return
+    try:
+        if hasattr(os, "killpg"):
+            os.killpg(process.pid, signum)
+        else:  # pragma: no cover
+            process.send_signal(signum)
+    except ProcessLookupError:
+        pass
+
+
+def _stop(process, grace):
+    """Terminate a script, and kill it if it does not exit in time."""
+    _signal_group(process, signal.SIGTERM)
+    try:
+        process.wait(timeout=grace)
+    except subprocess.TimeoutExpired:
+        _signal_group(process, getattr(signal, "SIGKILL", signal.SIGTERM))
+        process.wait()
+
+
+def exit_status(returncode):
+    """Get the shell exit status for the return code of a process.
+
+    A process killed by a signal has a negative return code, for which the
+    shell convention ``128 + signal`` is used.
+    """
+    return 128 - returncode if returncode < 0 else returncode
+
+
+def run_script(npmpkg, script_name, *args, output=None, timeout=None, grace=5.0):
+    """Run an NPM script and stream its output.
+
+    The script runs in its own process group. ``SIGINT`` and ``SIGTERM``
+    received while it runs are sent to the whole group, so that the processes
+    started by the script (e.g. webpack) are stopped as well.
+
+    :param npmpkg: NPM package whose script is run.
+    :param script_name: Name of the script.
+    :param args: Arguments of the script.
+    :param output: Called with each line (``str``) of the output of the
+        script. By default the output is discarded.
+    :param timeout: Seconds after which the script is stopped and
+        :class:`ScriptTimeout` is raised.
+    :param grace: Seconds to wait after ``SIGTERM`` before killing the script.
+    :returns: Exit status of the script.
+    """
+    if script_name not in npmpkg.package_json.get("scripts", {}):
+        raise RuntimeError("Invalid NPM script.")
+
+    start = time.monotonic()
+    process = subprocess.Popen(
+        script_command(npmpkg, script_name, *args),
+        cwd=dirname(npmpkg.package_json_path),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        shell=getattr(npmpkg, "_shell", False),
+        start_new_session=hasattr(os, "setsid"),
+    )
+
+    def forward():
+        for line in iter(process.stdout.readline, b""):
+            if output:
+                output(line.decode(errors="replace"))
+        process.stdout.close()
+
+    reader = threading.Thread(target=forward, daemon=True)
+    reader.start()
+
+    handlers = {}
+    if threading.current_thread() is threading.main_thread():
+        for signum in FORWARDED_SIGNALS:
+            handlers[signum] = signal.signal(
+                signum, lambda signum, frame: _signal_group(process, signum)
+            )
+    try:
+        process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        _stop(process, grace)
+        raise ScriptTimeout(
+            'NPM script "{}" did not finish within {}s.'.format(script_name, timeout)
+        )
+    except BaseException:
+        _stop(process, grace)
+        raise
+    finally:
+        for signum, handler in handlers.items():
+            signal.signal(signum, handler)
+        reader.join()
+        record("subprocess_seconds", time.monotonic() - start)
+    return exit_status(process.returncode)
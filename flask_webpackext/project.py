@@ -10,20 +10,39 @@
 
 """Webpack project utilities for Flask-WebpackExt."""
 
-from os.path import join
+import hashlib
+import json
+import os
+import shutil
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from os import makedirs
+from os.path import abspath, commonpath, dirname, exists, join, relpath
 
 from flask import current_app
 from flask.helpers import get_root_path
 from pywebpack import WebpackBundleProject as PyWebpackBundleProject
+from pywebpack import WebpackProject as PyWebpackProject
 from pywebpack import WebpackTemplateProject as PyWebpackTemplateProject
 from pywebpack.helpers import cached
 
+from .helpers import atomic_write, file_digest
+from .process import ScriptError, exit_status, run_script
 from .proxies import current_webpack
+from .storage import CopyIndex, IncrementalFileStorage
+from .timings import record, timed_phase, timed_storage
+
+_flask_configs = weakref.WeakKeyDictionary()
 
 
 def flask_config():
     """Flask configuration injected in Webpack.
 
+    The configuration is memoized per application until one of the values it
+    is computed from changes.
+
     :return: Dictionary which contains the information Flask-WebpackExt knows
         about a Webpack project and the absolute URLs for static files and
         assets. The dictionary consists of a key ``build`` with the following
@@ -36,23 +55,56 @@ def flask_config():
         * ``staticPath``: Absolute path to the generated static directory.
         * ``staticURL``: URL to access the static files..
     """
-    assets_url = current_app.config["WEBPACKEXT_PROJECT_DISTURL"]
-    if not assets_url.endswith("/"):
-        assets_url += "/"
-    static_url = current_app.static_url_path
-    if not static_url.endswith("/"):
-        static_url += "/"
-
-    return {
-        "build": {
-            "debug": current_app.debug,
-            "context": current_webpack.project.path,
-            "assetsPath": current_app.config["WEBPACKEXT_PROJECT_DISTDIR"],
+    app = current_app._get_current_object()
+    inputs = (
+        app.debug,
+        current_webpack.project.path,
+        app.config["WEBPACKEXT_PROJECT_DISTDIR"],
+        app.config["WEBPACKEXT_PROJECT_DISTURL"],
+        app.static_folder,
+        app.static_url_path,
+    )
+    cached = _flask_configs.get(app)
+    if cached is None or cached[0] != inputs:
+        debug, context, assets_path, assets_url, static_path, static_url = inputs
+        if not assets_url.endswith("/"):
+            assets_url += "/"
+        if not static_url.endswith("/"):
+            static_url += "/"
+        build = {
+            "debug": debug,
+            "context": context,
+            "assetsPath": assets_path,
             "assetsURL": assets_url,
-            "staticPath": current_app.static_folder,
+            "staticPath": static_path,
             "staticURL": static_url,
         }
-    }
+        cached = _flask_configs[app] = (inputs, build)
+    # Projects extend the returned configuration, so it must not be shared.
+    return {"build": dict(cached[1])}
+
+
+def write_json(path, data):
+    """Write data as JSON, unless the file already has the same content.
+
+    The file is replaced atomically, so that readers (e.g. a webpack watcher)
+    never see a partially written file. Leaving an identical file untouched
+    keeps its modification time, so that it does not invalidate the caches
+    of the build.
+
+    :returns: ``True`` if the file was written.
+    """
+    content = json.dumps(data, indent=2, sort_keys=True).encode()
+    try:
+        with open(path, "rb") as fp:
+            if fp.read() == content:
+                return False
+    except FileNotFoundError:
+        pass
+    makedirs(dirname(path), exist_ok=True)
+    with atomic_write(path) as fp:
+        fp.write(content)
+    return True
 
 
 def flask_allowed_copy_paths():
@@ -65,9 +117,92 @@ def flask_allowed_copy_paths():
     ]
 
 
-class _PathStoragePackageMixin:
+def _run_concurrently(tasks):
+    """Run tasks in threads with the application context."""
+    if len(tasks) <= 1:
+        for task in tasks:
+            task()
+        return
+    app = current_app._get_current_object()
+
+    def run(task):
+        with app.app_context():
+            task()
+
+    with ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+        for future in [executor.submit(run, t) for t in tasks]:
+            future.result()
+
+
+def _digest_stats(digest, folders, exclude_prefix=None):
+    """Add the names, sizes and modification times of files to a digest.
+
+    ``node_modules`` directories and files whose name starts with
+    ``exclude_prefix`` are skipped.
+    """
+    for i, folder in enumerate(folders):
+        for root, dirs, files in os.walk(folder):
+            dirs[:] = sorted(d for d in dirs if d != "node_modules")
+            for f in sorted(files):
+                if exclude_prefix and f.startswith(exclude_prefix):
+                    continue
+                path = join(root, f)
+                st = os.stat(path)
+                digest.update(
+                    "{}:{}:{}:{}\0".format(
+                        i, relpath(path, folder), st.st_size, st.st_mtime_ns
+                    ).encode()
+                )
+
+
+class _ScriptMixin:
+    """Mixin class for running the NPM scripts of a project."""
+
+    def run(self, script_name, *args, output=None, timeout=None):
+        """Run an NPM script.
+
+        With ``output`` or ``timeout``, the script is run with
+        :func:`~flask_webpackext.process.run_script`, which streams its output
+        and stops it after ``timeout`` seconds.
+
+        :returns: Exit status of the script.
+        """
+        if output is None and timeout is None:
+            start = time.monotonic()
+            try:
+                return exit_status(super().run(script_name, *args))
+            finally:
+                record("subprocess_seconds", time.monotonic() - start)
+        return run_script(
+            self.npmpkg, script_name, *args, output=output, timeout=timeout
+        )
+
+    def build(self, *args, output=None, timeout=None):
+        """Run the build script, see :meth:`run`.
+
+        :raises flask_webpackext.process.ScriptError: If the script fails.
+        """
+        status = self.run("build", *args, output=output, timeout=timeout)
+        if status != 0:
+            raise ScriptError(status)
+        return status
+
+
+class WebpackProject(_ScriptMixin, PyWebpackProject):
+    """Flask webpack project."""
+
+
+class _PathStoragePackageMixin(_ScriptMixin):
     """Mixin class for overriding various properties of the base ``WebpackProject``."""
 
+    _copy_index = None
+    _copy_workers = None
+
+    create_report = None
+    """:class:`~flask_webpackext.storage.CopyIndex` of the last incremental
+    :meth:`create`, which lists the added, updated, removed and unchanged
+    files."""
+
     @property
     def path(self):
         """Get path to project."""
@@ -76,7 +211,140 @@ class _PathStoragePackageMixin:
     @property
     def storage_cls(self):
         """Get storage class."""
-        return current_webpack.storage_cls
+        storage_cls = timed_storage(current_webpack.storage_cls)
+        if self._copy_index is not None:
+            return partial(storage_cls, index=self._copy_index)
+        return storage_cls
+
+    def write_config(self):
+        """Write the ``config.json`` of the project, if there is a config.
+
+        :returns: ``True`` if the file was written, i.e. its content changed.
+        """
+        config = self.config
+        if config:
+            return write_json(self.config_path, config)
+        return False
+
+    def copy_sources(self, force=None, skip=None):
+        """Copy the files of the project template into the project."""
+        self.storage_cls(self._project_template_dir, self.project_path).run(
+            force=force, skip=skip
+        )
+
+    def create_tasks(self, force=None, skip=None):
+        """Get the independent tasks which create the project.
+
+        The generated files are skipped when copying the sources, so that
+        the tasks can run concurrently.
+        """
+        skip = list(skip or [])
+        if self.config:
+            skip.append(relpath(self.config_path, self.project_path))
+        return [partial(self.copy_sources, force=force, skip=skip), self.write_config]
+
+    def create(self, force=None, skip=None, jobs=None):
+        """Create webpack project.
+
+        The sources are copied while the generated files (e.g.
+        ``config.json``) are written, see :meth:`create_tasks`. The directory
+        of ``config.json`` is created beforehand.
+
+        With an :class:`~flask_webpackext.storage.IncrementalFileStorage`
+        only new and changed files are copied, and files which were copied
+        by a previous run but no longer exist in the sources are removed.
+
+        :param jobs: Number of threads used to copy the bundles. By default
+            ``WEBPACKEXT_COPY_WORKERS``.
+        """
+        incremental = issubclass(current_webpack.storage_cls, IncrementalFileStorage)
+        if incremental:
+            self._copy_index = CopyIndex(self.project_path)
+        self._copy_workers = jobs
+        try:
+            makedirs(self.project_path, exist_ok=True)
+            # The storages do not create directories in a thread-safe way.
+            if self.config:
+                makedirs(dirname(self.config_path), exist_ok=True)
+            _run_concurrently(self.create_tasks(force=force, skip=skip))
+            if incremental:
+                self._copy_index.remove_stale()
+                self._copy_index.save()
+                self.create_report = self._copy_index
+        finally:
+            self._copy_index = None
+            self._copy_workers = None
+
+    stamp_filename = ".webpackext-{}"
+    """Name of the files in the project directory which hold the fingerprint
+    of the inputs of a step, see :meth:`is_up_to_date`."""
+
+    def step_fingerprint(self, step):
+        """Compute a fingerprint of the inputs of a step.
+
+        :param step: ``"create"`` or ``"build"``. The inputs of ``create``
+            are the names, sizes and modification times of the source files
+            and the generated data. The inputs of ``build`` are the names,
+            sizes and modification times of the files of the project directory
+            (except ``node_modules`` and the files of Flask-WebpackExt), and
+            the installed dependencies.
+        """
+        digest = hashlib.sha256()
+        if step == "create":
+            _digest_stats(digest, self.source_folders)
+            data = json.dumps(self._fingerprint_data(), sort_keys=True, default=str)
+            digest.update(data.encode())
+        elif step == "build":
+            _digest_stats(digest, [self.project_path], exclude_prefix=".webpackext")
+            stamp = join(self.project_path, self.install_stamp_filename)
+            if exists(stamp):
+                with open(stamp) as fp:
+                    digest.update(fp.read().encode())
+        else:
+            raise ValueError("Unknown step {}.".format(step))
+        return digest.hexdigest()
+
+    def _created_files_exist(self):
+        """Check if the files of the source folders exist in the project."""
+        for folder in self.source_folders:
+            for root, dirs, files in os.walk(folder):
+                dirs[:] = [d for d in dirs if d != "node_modules"]
+                for f in files:
+                    rel = relpath(join(root, f), folder)
+                    if not exists(join(self.project_path, rel)):
+                        return False
+        return True
+
+    def is_up_to_date(self, step):
+        """Check if the inputs of a step did not change since it last ran.
+
+        A ``create`` is in addition only up to date if all source files
+        exist in the project directory, and a ``build`` if its outputs exist.
+        """
+        stamp = join(self.project_path, self.stamp_filename.format(step))
+        if not exists(stamp):
+            return False
+        if step == "create" and not self._created_files_exist():
+            return False
+        if step == "build" and not all(
+            exists(p) for p in self._build_outputs().values()
+        ):
+            return False
+        with open(stamp) as fp:
+            return fp.read() == self.step_fingerprint(step)
+
+    def mark_up_to_date(self, step):
+        """Record the fingerprint of the inputs of a step which ran.
+
+        A ``create`` which ran invalidates the last ``build``.
+        """
+        if step == "create":
+            stamp = join(self.project_path, self.stamp_filename.format("build"))
+            if exists(stamp):
+                os.remove(stamp)
+        stamp = join(self.project_path, self.stamp_filename.format(step))
+        with open(stamp, "w") as fp:
+            fp.write(self.step_fingerprint(step))
 
     @property
     @cached
@@ -85,6 +353,187 @@ class _PathStoragePackageMixin:
         npm_pkg_cls = current_webpack.npm_pkg_cls
         return npm_pkg_cls(self.path)
 
+    install_skipped = False
+    """Whether the last :meth:`install` was skipped because the
+    dependencies did not change."""
+
+    lockfiles = (
+        "package-lock.json",
+        "npm-shrinkwrap.json",
+        "yarn.lock",
+        "pnpm-lock.yaml",
+    )
+    """Lockfiles which are part of the install fingerprint."""
+
+    install_stamp_filename = ".webpackext-install"
+    """Name of the file in the project directory which holds the install
+    fingerprint."""
+
+    def install_fingerprint(self, *args):
+        """Compute a fingerprint of the inputs of :meth:`install`.
+
+        The fingerprint covers the ``package.json`` of the project (which for
+        bundle projects includes the dependencies of all bundles), the
+        lockfiles, the package manager and the install arguments.
+        """
+        digest = hashlib.sha256()
+        digest.update(type(self.npmpkg).__name__.encode())
+        digest.update(json.dumps(args).encode())
+        for name in ("package.json",) + self.lockfiles:
+            path = join(self.project_path, name)
+            if exists(path):
+                digest.update(name.encode())
+                digest.update(file_digest(path).hexdigest().encode())
+        return digest.hexdigest()
+
+    def install(self, *args, force=False):
+        """Install project.
+
+        The installation is skipped if ``node_modules`` exists and the
+        :meth:`install_fingerprint` did not change since the last
+        installation, unless ``force`` is set or
+        ``WEBPACKEXT_INSTALL_SKIP_UNCHANGED`` is disabled.
+        """
+        stamp = join(self.project_path, self.install_stamp_filename)
+        skip = (
+            not force
+            and current_app.config["WEBPACKEXT_INSTALL_SKIP_UNCHANGED"]
+            and exists(join(self.project_path, "node_modules"))
+            and exists(stamp)
+        )
+        if skip:
+            with open(stamp) as fp:
+                skip = fp.read() == self.install_fingerprint(*args)
+        self.install_skipped = skip
+        if skip:
+            return 0
+
+        start = time.monotonic()
+        try:
+            result = super().install(*args)
+        finally:
+            record("subprocess_seconds", time.monotonic() - start)
+        # Lockfiles may have been updated by the installation.
+        with open(stamp, "w") as fp:
+            fp.write(self.install_fingerprint(*args))
+        return result
+
+    build_cache_hit = False
+    """Whether the last :meth:`buildall` restored the output from the build
+    cache instead of running webpack."""
+
+    @property
+    def source_folders(self):
+        """Folders whose files are copied into the project."""
+        return [self._project_template_dir]
+
+    def _fingerprint_data(self):
+        """Generated data which is an input of the build.
+
+        The storage class is included, as it determines how the files are
+        placed in the project (e.g. copied or linked).
+        """
+        storage_cls = current_webpack.storage_cls
+        return {
+            "config": self.config,
+            "storage_cls": "{}.{}".format(
+                storage_cls.__module__, storage_cls.__qualname__
+            ),
+        }
+
+    def fingerprint(self):
+        """Compute a fingerprint of all inputs of the build.
+
+        The fingerprint covers the content of all files in the project
+        template folder (and bundle folders) except ``node_modules``, and the
+        generated ``config.json`` (and ``package.json``).
+        """
+        digest = hashlib.sha256()
+        for i, folder in enumerate(self.source_folders):
+            for root, dirs, files in os.walk(folder):
+                dirs[:] = sorted(d for d in dirs if d != "node_modules")
+                for f in sorted(files):
+                    path = join(root, f)
+                    digest.update("{}:{}\0".format(i, relpath(path, folder)).encode())
+                    digest.update(file_digest(path).hexdigest().encode())
+        data = json.dumps(self._fingerprint_data(), sort_keys=True, default=str)
+        digest.update(data.encode())
+        return digest.hexdigest()
+
+    def _build_outputs(self):
+        """Output paths of the build which are stored in the build cache."""
+        distdir = current_app.config["WEBPACKEXT_PROJECT_DISTDIR"]
+        outputs = {"dist": distdir}
+        manifest = current_webpack.manifest_path
+        if manifest and commonpath([abspath(manifest), abspath(distdir)]) != abspath(
+            distdir
+        ):
+            outputs["manifest"] = manifest
+        return outputs
+
+    def restore_build(self, cache_path):
+        """Restore the build output from a build cache entry.
+
+        :returns: ``True`` if the entry exists and was restored.
+        """
+        if not exists(cache_path):
+            return False
+        for name, path in self._build_outputs().items():
+            src = join(cache_path, name)
+            if os.path.isdir(src):
+                shutil.copytree(src, path, dirs_exist_ok=True)
+            elif exists(src):
+                makedirs(dirname(path), exist_ok=True)
+                shutil.copy2(src, path)
+        return True
+
+    def store_build(self, cache_path):
+        """Store the build output in a build cache entry."""
+        tmp_path = "{}.{}.tmp".format(cache_path, os.getpid())
+        makedirs(tmp_path)
+        for name, path in self._build_outputs().items():
+            if os.path.isdir(path):
+                shutil.copytree(path, join(tmp_path, name))
+            elif exists(path):
+                shutil.copy2(path, join(tmp_path, name))
+        try:
+            os.rename(tmp_path, cache_path)
+        except OSError:
+            # Stored concurrently by another build.
+            shutil.rmtree(tmp_path)
+
+    def buildall(self, force_install=False, jobs=None):
+        """Build project from scratch.
+
+        If ``WEBPACKEXT_BUILD_CACHE_DIR`` is set and contains the output of a
+        build with the same :meth:`fingerprint`, the output is restored from
+        there instead.
+
+        :param force_install: Install even if the dependencies did not
+            change, see :meth:`install`.
+        :param jobs: Number of threads used to copy the bundles, see
+            :meth:`create`.
+        """
+        self.build_cache_hit = False
+        cache_dir = current_app.config["WEBPACKEXT_BUILD_CACHE_DIR"]
+        if cache_dir:
+            with timed_phase("fingerprint"):
+                cache_path = join(cache_dir, self.fingerprint())
+            with timed_phase("restore"):
+                self.build_cache_hit = self.restore_build(cache_path)
+            if self.build_cache_hit:
+                return
+
+        with timed_phase("create"):
+            self.create(jobs=jobs)
+        with timed_phase("install"):
+            self.install(force=force_install)
+        with timed_phase("build"):
+            self.build()
+        if cache_dir:
+            with timed_phase("store"):
+                self.store_build(cache_path)
+
 
 class WebpackTemplateProject(_PathStoragePackageMixin, PyWebpackTemplateProject):
     """Flask webpack template project."""
@@ -165,3 +614,84 @@ class WebpackBundleProject(_PathStoragePackageMixin, PyWebpackBundleProject):
             allowed_copy_paths=allowed_copy_paths or flask_allowed_copy_paths,
             **kwargs,
         )
+
+    @property
+    def copy_workers(self):
+        """Number of threads used to copy the bundles.
+
+        The ``jobs`` of the running :meth:`create`, or by default
+        ``WEBPACKEXT_COPY_WORKERS``.
+        """
+        return self._copy_workers or current_app.config["WEBPACKEXT_COPY_WORKERS"] or 1
+
+    def collect(self, force=None):
+        """Collect asset files from bundles.
+
+        Bundles are copied concurrently by ``WEBPACKEXT_COPY_WORKERS``
+        threads. If several bundles provide the same file, the file of the
+        first bundle is used and a warning is logged, independently of the
+        order in which the bundles are copied.
+        """
+        storages = [self.storage_cls(b.path, self.project_path) for b in self.bundles]
+
+        owners = {}
+        skips = [set() for _ in storages]
+        for i, storage in enumerate(storages):
+            for _, relpath in storage:
+                owner = owners.setdefault(relpath, i)
+                if owner != i:
+                    skips[i].add(relpath)
+                    current_app.logger.warning(
+                        "%s is provided by bundles %s and %s, using the former.",
+                        relpath,
+                        self.bundles[owner].path,
+                        self.bundles[i].path,
+                    )
+        # Create directories upfront, as the storages do not create them in a
+        # thread-safe way.
+        for d in {dirname(join(self.project_path, r)) for r in owners}:
+            makedirs(d, exist_ok=True)
+
+        app = current_app._get_current_object()
+
+        def run(i):
+            with app.app_context():
+                storages[i].run(force=force, skip=skips[i])
+
+        workers = min(self.copy_workers, len(storages))
+        if workers <= 1:
+            for i in range(len(storages)):
+                storages[i].run(force=force, skip=skips[i])
+            return
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for future in [executor.submit(run, i) for i in range(len(storages))]:
+                future.result()
+
+    def write_package_json(self):
+        """Write the ``package.json`` with the dependencies of all bundles.
+
+        :returns: ``True`` if the file was written, i.e. its content changed.
+        """
+        return write_json(self.npmpkg.package_json_path, self.package_json)
+
+    def copy_sources(self, force=None, skip=None):
+        """Copy the files of the project template and of the bundles."""
+        super().copy_sources(force=force, skip=skip)
+        self.collect(force=force)
+
+    def create_tasks(self, force=None, skip=None):
+        """Get the independent tasks which create the project."""
+        skip = list(skip or []) + ["package.json"]
+        tasks = super().create_tasks(force=force, skip=skip)
+        return tasks + [self.write_package_json]
+
+    @property
+    def source_folders(self):
+        """Folders whose files are copied into the project."""
+        return super().source_folders + [b.path for b in self.bundles]
+
+    def _fingerprint_data(self):
+        """Generated data which is an input of the build."""
+        data = super()._fingerprint_data()
+        data["package_json"] = self.package_json
+        return data
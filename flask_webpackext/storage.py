@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Flask-WebpackExt
+# Copyright (C) 2026 CERN.
+#
+# Flask-WebpackExt is free software; you can redistribute it and/or modify
+# it under the terms of the Revised BSD License; see LICENSE file for
+# more details.
+
+"""Storage classes for Flask-WebpackExt."""
+
+import errno
+import json
+import os
+import sys
+import threading
+from fnmatch import fnmatch
+from os.path import basename, exists, getmtime, join, relpath, samefile
+from shutil import copy
+
+from pywebpack import FileStorage
+
+from .helpers import file_digest
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+FICLONE = 0x40049409
+"""Linux ``ioctl`` request to clone (reflink) a file."""
+
+_UNSUPPORTED_ERRNOS = (
+    errno.EXDEV,
+    errno.EPERM,
+    errno.EINVAL,
+    errno.ENOTTY,
+    errno.EOPNOTSUPP,
+    errno.EMLINK,
+)
+
+
+class CopyIndex(object):
+    """Persisted index of the files copied into a project.
+
+    For each copied file, the index records its source path, the size and
+    modification time of the source, and a hash of its content. This allows
+    to skip unchanged files and to remove files which are no longer provided
+    by any source.
+    """
+
+    filename = ".webpackext-index.json"
+    """Name of the index file in the project directory."""
+
+    def __init__(self, project_path):
+        """Initialize index.
+
+        :param project_path: Project directory the files are copied into.
+        """
+        self.project_path = project_path
+        self.path = join(project_path, self.filename)
+        self.entries = {}
+        self.seen = set()
+        self.added = []
+        self.updated = []
+        self.unchanged = []
+        self.removed = []
+        self._lock = threading.Lock()
+        if exists(self.path):
+            try:
+                with open(self.path) as fp:
+                    self.entries = json.load(fp)
+            except ValueError:
+                self.entries = {}
+
+    def key(self, dst):
+        """Key of a destination file in the index."""
+        return relpath(dst, self.project_path)
+
+    def is_unchanged(self, src, dst, st):
+        """Check if a destination file is up to date with its source.
+
+        Only the file metadata is compared. See :meth:`same_content`.
+        """
+        entry = self.entries.get(self.key(dst))
+        return (
+            entry is not None
+            and entry["src"] == src
+            and entry["size"] == st.st_size
+            and entry["mtime_ns"] == st.st_mtime_ns
+            and exists(dst)
+        )
+
+    def same_content(self, dst, digest):
+        """Check if a destination file has the given content hash."""
+        entry = self.entries.get(self.key(dst))
+        return entry is not None and entry["hash"] == digest and exists(dst)
+
+    def record(self, src, dst, st, digest, report):
+        """Record a file in the index.
+
+        :param report: List (``added``, ``updated`` or ``unchanged``) to
+            which the file is added.
+        """
+        key = self.key(dst)
+        with self._lock:
+            self.seen.add(key)
+            self.entries[key] = {
+                "src": src,
+                "size": st.st_size,
+                "mtime_ns": st.st_mtime_ns,
+                "hash": digest,
+            }
+            report.append(key)
+
+    def remove_stale(self):
+        """Remove files copied by a previous run but not by the current one."""
+        for key in sorted(set(self.entries) - self.seen):
+            path = join(self.project_path, key)
+            if exists(path):
+                os.remove(path)
+            del self.entries[key]
+            self.removed.append(key)
+
+    def save(self):
+        """Write the index to the project directory."""
+        with open(self.path, "w") as fp:
+            json.dump(self.entries, fp, indent=2, sort_keys=True)
+
+    def summary(self):
+        """Human readable summary of the changes of the current run."""
+        return "{} added, {} updated, {} removed, {} unchanged.".format(
+            len(self.added), len(self.updated), len(self.removed), len(self.unchanged)
+        )
+
+
+class IncrementalFileStorage(FileStorage):
+    """Storage class that only copies new or changed files.
+
+    Used with a :class:`CopyIndex` shared by all storages of a project, e.g.
+    by setting ``WEBPACKEXT_STORAGE_CLS`` to this class. Files whose source
+    size and modification time did not change since the last copy are
+    skipped without being read. Otherwise the content hash decides whether
+    the file is copied.
+    """
+
+    def __init__(self, srcdir, dstdir, index=None, **kwargs):
+        """Initialize storage.
+
+        :param index: The :class:`CopyIndex` of the project. Without index,
+            the storage behaves like :class:`pywebpack.storage.FileStorage`.
+        """
+        super().__init__(srcdir, dstdir, **kwargs)
+        self.index = index
+
+    def _copyfile(self, src, dst, force=False):
+        """Copy file from source to destination if it changed."""
+        if self.index is None:
+            return super()._copyfile(src, dst, force=force)
+
+        st = os.stat(src)
+        if not force and self.index.is_unchanged(src, dst, st):
+            entry = self.index.entries[self.index.key(dst)]
+            self.index.record(src, dst, st, entry["hash"], self.index.unchanged)
+            return
+
+        digest = file_digest(src).hexdigest()
+        if not force and self.index.same_content(dst, digest):
+            self.index.record(src, dst, st, digest, self.index.unchanged)
+            return
+
+        report = self.index.updated if exists(dst) else self.index.added
+        super()._copyfile(src, dst, force=True)
+        self.index.record(src, dst, st, digest, report)
+
+
+class HardlinkStorage(FileStorage):
+    """Storage class that links files instead of copying them.
+
+    Files are reflinked (copy-on-write clones) on Linux filesystems which
+    support it, otherwise hardlinked. If neither is possible (e.g. across
+    devices) the file is copied.
+
+    A hardlinked file shares its content with the source file: a tool which
+    modifies a file in the project in place also modifies the source. Files
+    matching :attr:`copy_patterns` (by default JSON files such as
+    ``config.json`` and ``package.json``, which are rewritten by
+    Flask-WebpackExt and the package manager) are therefore always copied.
+    """
+
+    copy_patterns = ("*.json",)
+    """File name patterns which are always copied."""
+
+    def __init__(self, *args, **kwargs):
+        """Initialize storage."""
+        super().__init__(*args, **kwargs)
+        self._reflink = fcntl is not None and sys.platform.startswith("linux")
+        self._hardlink = True
+
+    def _copyfile(self, src, dst, force=False):
+        """Link file from source to destination."""
+        if exists(dst):
+            if not force and (samefile(src, dst) or getmtime(dst) >= getmtime(src)):
+                return
+            os.remove(dst)
+        if any(fnmatch(basename(dst), p) for p in self.copy_patterns):
+            copy(src, dst)
+        elif not (self._reflink_file(src, dst) or self._link_file(src, dst)):
+            copy(src, dst)
+
+    def _reflink_file(self, src, dst):
+        """Clone a file, if supported by the filesystem."""
+        if not self._reflink:
+            return False
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            try:
+                fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+                return True
+            except OSError as e:
+                if e.errno not in _UNSUPPORTED_ERRNOS:
+                    raise
+        # Don't try again for the other files of this storage.
+        self._reflink = False
+        os.remove(dst)
+        return False
+
+    def _link_file(self, src, dst):
+        """Hardlink a file, if supported by the filesystem."""
+        if not self._hardlink:
+            return False
+        try:
+            os.link(src, dst)
+            return True
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED_ERRNOS:
+                raise
+            self._hardlink = False
+            return False
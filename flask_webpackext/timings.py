@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Flask-WebpackExt
+# Copyright (C) 2026 CERN.
+#
+# Flask-WebpackExt is free software; you can redistribute it and/or modify
+# it under the terms of the Revised BSD License; see LICENSE file for
+# more details.
+
+"""Timing instrumentation of the phases of a webpack project build."""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+_current = None
+_lock = threading.Lock()
+_timed_storages = {}
+
+
+class Timings(object):
+    """Records the duration and statistics of build phases.
+
+    For each phase the wall clock time, the number of files copied into the
+    project, the size of these files and the time spent in package manager
+    subprocesses are recorded. Phases can be nested, in which case the
+    statistics of a phase include the ones of its sub-phases.
+    """
+
+    def __init__(self):
+        """Initialize timings."""
+        self.phases = []
+        self._stack = []
+
+    @contextmanager
+    def phase(self, name):
+        """Record a phase."""
+        data = {
+            "phase": "/".join([p["phase"] for p in self._stack[-1:]] + [name]),
+            "seconds": 0.0,
+            "files_copied": 0,
+            "bytes_written": 0,
+            "subprocess_seconds": 0.0,
+        }
+        self.phases.append(data)
+        self._stack.append(data)
+        start = time.monotonic()
+        try:
+            yield data
+        finally:
+            data["seconds"] = time.monotonic() - start
+            self._stack.pop()
+
+    def add(self, key, value):
+        """Add to a statistic of the current phases."""
+        with _lock:
+            for data in self._stack:
+                data[key] += value
+
+    def report(self):
+        """Get the timings as a JSON serializable dictionary."""
+        return {
+            "phases": self.phases,
+            "total_seconds": sum(
+                p["seconds"] for p in self.phases if "/" not in p["phase"]
+            ),
+        }
+
+    def summary(self):
+        """Get a human readable summary, one line per phase."""
+        lines = []
+        for p in self.phases:
+            line = "{:<20} {:>8.2f}s".format(p["phase"], p["seconds"])
+            if p["files_copied"]:
+                line += "  {} files, {} bytes copied".format(
+                    p["files_copied"], p["bytes_written"]
+                )
+            if p["subprocess_seconds"]:
+                line += "  {:.2f}s in subprocesses".format(p["subprocess_seconds"])
+            lines.append(line)
+        lines.append("{:<20} {:>8.2f}s".format("total", self.report()["total_seconds"]))
+        return lines
+
+
+def start_timings():
+    """Start recording timings and return the :class:`Timings`."""
+    global _current
+    _current = Timings()
+    return _current
+
+
+def stop_timings():
+    """Stop recording timings."""
+    global _current
+    _current = None
+
+
+@contextmanager
+def timed_phase(name):
+    """Record a phase if timings are being recorded."""
+    if _current is None:
+        yield None
+    else:
+        with _current.phase(name) as data:
+            yield data
+
+
+def record(key, value):
+    """Add to a statistic of the current phases, if recording."""
+    if _current is not None:
+        _current.add(key, value)
+
+
+def _signature(path):
+    try:
+        st = os.lstat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+def timed_storage(storage_cls):
+    """Get a storage class which records the copied files, if recording."""
+    if _current is None or not isinstance(storage_cls, type):
+        return storage_cls
+    if storage_cls not in _timed_storages:
+
+        def _copyfile(self, src, dst, force=False):
+            before = _signature(dst)
+            super(cls, self)._copyfile(src, dst, force=force)
+            after = _signature(dst)
+            if after is not None and after != before:
+                record("files_copied", 1)
+                record("bytes_written", after[1])
+
+        cls = type(storage_cls.__name__, (storage_cls,), {"_copyfile": _copyfile})
+        _timed_storages[storage_cls] = cls
+    return _timed_storages[storage_cls]
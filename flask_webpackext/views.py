@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Flask-WebpackExt
+# Copyright (C) 2026 CERN.
+#
+# Flask-WebpackExt is free software; you can redistribute it and/or modify
+# it under the terms of the Revised BSD License; see LICENSE file for
+# more details.
+
+"""View serving the files of the dist directory."""
+
+import mimetypes
+import os
+import re
+from collections import namedtuple
+from os.path import basename, isfile, relpath
+from time import time
+from urllib.parse import quote
+
+from flask import abort, current_app, request, send_file
+from werkzeug.security import safe_join
+from werkzeug.wsgi import wrap_file
+
+from .compress import SUFFIXES, compressed_path, is_fresh
+from .proxies import current_webpack
+
+StaticFile = namedtuple(
+    "StaticFile", ["path", "name", "size", "mtime_ns", "mimetype", "etag", "immutable"]
+)
+"""File (or compressed variant of a file) in the static file index.
+
+``name`` is the path relative to the dist directory. ``immutable`` is set for
+files with a :func:`content_hash`, whose ``etag`` is derived from the hash.
+"""
+
+
+def _stat_etag(st):
+    """Compute the ETag of a file from its modification time and size."""
+    return "{:x}-{:x}".format(st.st_mtime_ns, st.st_size)
+
+
+def content_hash(filename, pattern):
+    """Get the content hash in the name of a file.
+
+    :param pattern: Regular expression whose first group matches the hash,
+        see ``WEBPACKEXT_HASHED_FILENAME_PATTERN``.
+    :returns: The hash, or ``None`` if the name has none.
+    """
+    match = re.search(pattern, basename(filename))
+    return match.group(1) if match else None
+
+
+def build_static_index(files, distdir, pattern):
+    """Build the static file index of the files of a manifest.
+
+    Files which do not exist are skipped. Compressed variants are indexed if
+    they are up to date.
+
+    :param files: Dictionary mapping file URLs to paths, see
+        :func:`~flask_webpackext.integrity.manifest_files`.
+    :param distdir: Directory where the files of the manifest are located.
+    :param pattern: Regular expression matching the content hash in a file
+        name, see :func:`content_hash`.
+    :returns: Dictionary mapping file URLs to dictionaries mapping content
+        encodings (``None`` for the file itself) to :class:`StaticFile`.
+    """
+    index = {}
+    for url, path in files.items():
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            continue
+        mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        hash_ = content_hash(path, pattern)
+        variants = {}
+        for encoding in [None] + list(SUFFIXES):
+            if encoding is None:
+                variant_path, variant_st = path, st
+            else:
+                variant_path = compressed_path(path, encoding)
+                if not is_fresh(path, variant_path):
+                    continue
+                variant_st = os.stat(variant_path)
+            if hash_:
+                # Each encoding is a different representation with its own ETag.
+                etag = "{}-{}".format(hash_, encoding) if encoding else hash_
+            else:
+                etag = _stat_etag(variant_st)
+            variants[encoding] = StaticFile(
+                variant_path,
+                relpath(variant_path, distdir),
+                variant_st.st_size,
+                variant_st.st_mtime_ns,
+                mimetype,
+                etag,
+                hash_ is not None,
+            )
+        index[url] = variants
+    return index
+
+
+def _send_indexed(static_file, encoding):
+    """Send a file of the static file index.
+
+    The file is sent with ``X-Accel-Redirect`` if
+    ``WEBPACKEXT_X_ACCEL_REDIRECT_PREFIX`` is set, with ``X-Sendfile`` if
+    ``USE_X_SENDFILE`` is set, and otherwise with the file wrapper of the
+    WSGI server (which usually uses ``sendfile``).
+
+    :returns: The response, or ``None`` if the file no longer exists or
+        changed since the index was built.
+    """
+    config = current_app.config
+    response_class = current_app.response_class
+    accel_prefix = config["WEBPACKEXT_X_ACCEL_REDIRECT_PREFIX"]
+    redirected = bool(accel_prefix or config["USE_X_SENDFILE"])
+    fp = None
+    try:
+        if redirected:
+            st = os.stat(static_file.path)
+        else:
+            fp = open(static_file.path, "rb")
+            st = os.fstat(fp.fileno())
+    except FileNotFoundError:
+        return None
+    if (st.st_size, st.st_mtime_ns) != (static_file.size, static_file.mtime_ns):
+        if fp is not None:
+            fp.close()
+        return None
+
+    if accel_prefix:
+        response = response_class(mimetype=static_file.mimetype)
+        response.headers["X-Accel-Redirect"] = "{}/{}".format(
+            accel_prefix.rstrip("/"), quote(static_file.name.replace(os.sep, "/"))
+        )
+    elif redirected:
+        response = response_class(mimetype=static_file.mimetype)
+        response.headers["X-Sendfile"] = static_file.path
+    else:
+        data = wrap_file(request.environ, fp)
+        response = response_class(
+            data, mimetype=static_file.mimetype, direct_passthrough=True
+        )
+    response.content_length = st.st_size
+    response.last_modified = int(st.st_mtime)
+    response.set_etag(static_file.etag if static_file.immutable else _stat_etag(st))
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+
+    immutable = static_file.immutable and config["WEBPACKEXT_IMMUTABLE_MAX_AGE"]
+    if immutable:
+        max_age = config["WEBPACKEXT_IMMUTABLE_MAX_AGE"]
+    else:
+        max_age = current_app.get_send_file_max_age(static_file.name)
+    if max_age is None:
+        response.cache_control.no_cache = True
+    else:
+        if max_age > 0:
+            response.cache_control.public = True
+        response.cache_control.max_age = max_age
+        response.expires = int(time() + max_age)
+    if immutable:
+        response.cache_control.immutable = True
+
+    # Ranges of redirected files are handled by the web server.
+    response = response.make_conditional(
+        request, accept_ranges=not redirected, complete_length=st.st_size
+    )
+    if redirected and response.status_code == 304:
+        response.headers.pop("X-Sendfile", None)
+        response.headers.pop("X-Accel-Redirect", None)
+    return response
+
+
+def dist_view(filename):
+    """Serve a file of ``WEBPACKEXT_PROJECT_DISTDIR``.
+
+    If the client accepts one of ``WEBPACKEXT_PRECOMPRESS_ENCODINGS`` and an
+    up to date compressed variant of the file exists, the variant is sent
+    instead, with the corresponding ``Content-Encoding``.
+
+    Files of the manifest are looked up in the static file index of the
+    extension, which is rebuilt when the manifest is reloaded. Files which
+    changed or were removed since are looked up on the disk instead. Those
+    with a :func:`content_hash` are sent
+    with ``Cache-Control: public, max-age=<WEBPACKEXT_IMMUTABLE_MAX_AGE>,
+    immutable`` and a strong ETag derived from the hash. Other files are sent
+    with the default headers of the application.
+    """
+    config = current_app.config
+    encodings = config["WEBPACKEXT_PRECOMPRESS_ENCODINGS"]
+    url = "{}/{}".format(config["WEBPACKEXT_PROJECT_DISTURL"].rstrip("/"), filename)
+    try:
+        index = current_webpack.static_index
+    except FileNotFoundError:
+        index = None
+    variants = index.get(url) if index else None
+    if variants is not None:
+        encoding = next(
+            (e for e in encodings if e in variants and request.accept_encodings[e]),
+            None,
+        )
+        response = _send_indexed(variants[encoding], encoding)
+        if response is not None:
+            response.vary.add("Accept-Encoding")
+            return response
+
+    path = safe_join(config["WEBPACKEXT_PROJECT_DISTDIR"], filename)
+    if path is None or not isfile(path):
+        abort(404)
+    mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    encoding = next(
+        (
+            e
+            for e in encodings
+            if request.accept_encodings[e] and is_fresh(path, compressed_path(path, e))
+        ),
+        None,
+    )
+    if encoding:
+        response = send_file(compressed_path(path, encoding), mimetype=mimetype)
+        response.headers["Content-Encoding"] = encoding
+    else:
+        response = send_file(path, mimetype=mimetype)
+    response.vary.add("Accept-Encoding")
+    return response
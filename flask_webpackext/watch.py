@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Flask-WebpackExt
+# Copyright (C) 2026 CERN.
+#
+# Flask-WebpackExt is free software; you can redistribute it and/or modify
+# it under the terms of the Revised BSD License; see LICENSE file for
+# more details.
+
+"""Watch the sources of a Webpack project and sync changes into it.
+
+Changes are detected with `watchdog`_ (inotify, FSEvents, ...) if it is
+installed (``pip install flask-webpackext[watch]``), otherwise by polling the
+source folders.
+
+.. _watchdog: https://pypi.org/project/watchdog/
+"""
+
+import os
+import queue
+import time
+from os import makedirs
+from os.path import dirname, exists, join, relpath
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # pragma: no cover
+    FileSystemEventHandler = object
+    Observer = None
+
+
+class _QueueEventHandler(FileSystemEventHandler):
+    """Watchdog event handler which puts changed paths in a queue."""
+
+    def __init__(self, changes):
+        super().__init__()
+        self.changes = changes
+
+    def on_any_event(self, event):
+        if event.is_directory:
+            return
+        self.changes.put(event.src_path)
+        if getattr(event, "dest_path", None):
+            self.changes.put(event.dest_path)
+
+
+class ProjectWatcher(object):
+    """Sync changed files from the source folders into the project.
+
+    Only the changed files are copied (with the storage class of the project)
+    or removed. If several source folders provide the same file, the file of
+    the first folder is used, as in ``flask webpack create``.
+    """
+
+    ignored = ("package.json",)
+    """File names which are not synced, as they are generated."""
+
+    def __init__(self, project, debounce=0.2, interval=1.0, poll=None):
+        """Initialize watcher.
+
+        :param project: Project with ``source_folders``, e.g. a
+            :class:`~flask_webpackext.project.WebpackBundleProject`.
+        :param debounce: Seconds without changes to wait before syncing.
+        :param interval: Seconds between two scans when polling.
+        :param poll: Poll for changes instead of using watchdog. By default
+            polling is only used if watchdog is not installed.
+        """
+        self.project = project
+        self.folders = list(project.source_folders)
+        self.debounce = debounce
+        self.interval = interval
+        self.poll = Observer is None if poll is None else poll
+        self._snapshot = self.scan()
+
+    def scan(self):
+        """Get the size and modification time of all source files."""
+        snapshot = {}
+        for folder in self.folders:
+            for root, dirs, files in os.walk(folder):
+                dirs[:] = [d for d in dirs if d != "node_modules"]
+                for f in files:
+                    path = join(root, f)
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    snapshot[path] = (st.st_size, st.st_mtime_ns)
+        return snapshot
+
+    def changes(self):
+        """Get the source files changed since the last scan."""
+        snapshot = self.scan()
+        changed = {
+            path
+            for path in set(snapshot) | set(self._snapshot)
+            if snapshot.get(path) != self._snapshot.get(path)
+        }
+        self._snapshot = snapshot
+        return changed
+
+    def _source(self, path):
+        """Get the source folder and relative path of a changed file."""
+        for folder in self.folders:
+            rel = relpath(path, folder)
+            if not rel.startswith(os.pardir + os.sep):
+                return folder, rel
+        return None, None
+
+    def sync(self, paths):
+        """Sync changed source files into the project.
+
+        :returns: List of synced paths relative to the project.
+        """
+        synced = []
+        for path in sorted(paths):
+            folder, rel = self._source(path)
+            if folder is None or os.path.basename(rel) in self.ignored:
+                continue
+            if "node_modules" in rel.split(os.sep):
+                continue
+            # The file of the first folder providing it wins. If it was
+            # removed from the folder which provided it, the file of the next
+            # folder providing it is copied.
+            owner = next((f for f in self.folders if exists(join(f, rel))), None)
+            index = self.folders.index
+            if owner is not None and index(owner) < index(folder):
+                continue
+            dst = join(self.project.project_path, rel)
+            if owner is None:
+                if exists(dst):
+                    os.remove(dst)
+            else:
+                makedirs(dirname(dst), exist_ok=True)
+                storage = self.project.storage_cls(owner, self.project.project_path)
+                storage._copyfile(join(owner, rel), dst, force=True)
+            synced.append(rel)
+        return synced
+
+    def _iter_batches(self, stop):
+        """Yield debounced batches of changed paths until ``stop()``."""
+        pending = set()
+        last_change = None
+        if self.poll:
+            while not stop():
+                changed = self.changes()
+                now = time.monotonic()
+                if changed:
+                    pending |= changed
+                    last_change = now
+                elif pending and now - last_change >= self.debounce:
+                    yield pending
+                    pending = set()
+                time.sleep(self.interval if not pending else self.debounce)
+            return
+
+        events = queue.Queue()
+        observer = Observer()
+        handler = _QueueEventHandler(events)
+        for folder in self.folders:
+            observer.schedule(handler, folder, recursive=True)
+        observer.start()
+        try:
+            while not stop():
+                try:
+                    pending.add(events.get(timeout=self.debounce))
+                except queue.Empty:
+                    if pending:
+                        yield pending
+                        pending = set()
+        finally:
+            observer.stop()
+            observer.join()
+
+    def run(self, callback=None, stop=None):
+        """Watch the source folders and sync changes until ``stop()``.
+
+        :param callback: Called with the list of synced paths after each sync.
+        :param stop: Callable which returns ``True`` to stop watching. By
+            default the watcher runs until interrupted.
+        """
+        stop = stop or (lambda: False)
+        for paths in self._iter_batches(stop):
+            synced = self.sync(paths)
+            if synced and callback:
+                callback(synced)
@@ -28,6 +28,16 @@ from flask_webpackext import (
 )
 
 
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config):
+    """Run the benchmarks only once, unless ``--benchmark-enable`` is given.
+
+    pytest-benchmark is optional, the benchmarks are skipped without it.
+    """
+    if config.pluginmanager.hasplugin("benchmark"):
+        config.option.benchmark_disable = True
+
+
 @pytest.fixture()
 def tmpdir():
     """Temporary directory."""
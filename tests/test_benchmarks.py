@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Flask-WebpackExt
+# Copyright (C) 2026 CERN.
+#
+# Flask-WebpackExt is free software; you can redistribute it and/or modify
+# it under the terms of the Revised BSD License; see LICENSE file for
+# more details.
+
+"""Benchmarks of the manifest loading and rendering hot paths.
+
+The benchmarks only run once, as smoke tests, with the default options of the
+test suite. To measure them, run::
+
+    pytest tests/test_benchmarks.py --benchmark-enable
+
+and compare runs with ``--benchmark-autosave`` and ``--benchmark-compare``.
+"""
+
+import json
+from os.path import join
+
+import pytest
+from flask import Flask, render_template
+from jinja2 import DictLoader
+
+from flask_webpackext import FlaskWebpackExt, current_manifest
+from flask_webpackext.manifest import (
+    CompiledManifestLoader,
+    JinjaManifestLoader,
+    LazyJinjaManifestLoader,
+    compile_manifest,
+)
+
+pytest.importorskip("pytest_benchmark")
+
+SIZES = [10, 1000, 50000]
+
+LOADERS = {
+    "jinja": JinjaManifestLoader,
+    "lazy": LazyJinjaManifestLoader,
+    "compiled": CompiledManifestLoader,
+}
+
+PAGE = """<html><head>{{ webpack['entry1.css'] }}</head><body>
+{% for name in names %}{{ webpack[name] }}{% endfor %}
+</body></html>"""
+
+
+def make_manifest(path, entries, prefix="/static/dist/"):
+    """Write a synthetic manifest with hashed JavaScript and CSS files.
+
+    Entries are named ``entry<i>.js`` and ``entry<i>.css``, alternately.
+    """
+    manifest = {}
+    for i in range(entries):
+        ext = ".css" if i % 2 else ".js"
+        name = "entry{}{}".format(i, ext)
+        manifest[name] = "{}entry{}.{:08x}{}".format(prefix, i, i * 2654435761, ext)
+    with open(path, "w") as fp:
+        json.dump(manifest, fp)
+    return path
+
+
+@pytest.fixture(scope="module", params=SIZES)
+def manifest_size(request):
+    """Number of entries of the synthetic manifest."""
+    return request.param
+
+
+@pytest.fixture(scope="module")
+def manifest_file(manifest_size, tmp_path_factory):
+    """Synthetic manifest file, also compiled."""
+    path = str(tmp_path_factory.mktemp("manifest") / "manifest.json")
+    make_manifest(path, manifest_size)
+    compile_manifest(path)
+    return path
+
+
+def make_app(tmpdir, manifest_path, loader=JinjaManifestLoader, debug=False):
+    """Application using a manifest."""
+    app = Flask("benchmark", instance_path=join(tmpdir, "instance"))
+    app.debug = debug
+    app.config.update(
+        WEBPACKEXT_MANIFEST_PATH=manifest_path,
+        WEBPACKEXT_MANIFEST_LOADER=loader,
+    )
+    FlaskWebpackExt(app)
+    return app
+
+
+@pytest.mark.parametrize("loader", list(LOADERS))
+def test_load_cold(benchmark, tmpdir, manifest_file, loader):
+    """Benchmark parsing a manifest."""
+    app = make_app(tmpdir, manifest_file, LOADERS[loader])
+    state = app.extensions["flask-webpackext"]
+    with app.app_context():
+        manifest = benchmark.pedantic(
+            state.manifest_loader().load,
+            args=(manifest_file,),
+            setup=state.manifest_cache.clear,
+            rounds=10,
+        )
+        assert manifest["entry0.js"]
+
+
+@pytest.mark.parametrize("debug", [False, True], ids=["prod", "debug"])
+def test_load_cached(benchmark, tmpdir, manifest_file, debug):
+    """Benchmark getting the cached manifest, as done for each entry access."""
+    app = make_app(tmpdir, manifest_file, debug=debug)
+    state = app.extensions["flask-webpackext"]
+    with app.app_context():
+        loader = state.manifest_loader()
+        loader.load(manifest_file)
+        assert benchmark(loader.load, manifest_file)
+
+
+def test_proxy_access(benchmark, tmpdir, manifest_file):
+    """Benchmark accessing an entry through the ``current_manifest`` proxy."""
+    app = make_app(tmpdir, manifest_file)
+    with app.test_request_context():
+        entry = benchmark(lambda: current_manifest["entry0.js"])
+        assert entry.name == "entry0.js"
+
+
+def test_entry_html(benchmark, tmpdir, manifest_file):
+    """Benchmark rendering an entry, as done by Jinja."""
+    app = make_app(tmpdir, manifest_file)
+    with app.test_request_context():
+        entry = current_manifest["entry0.js"]
+        html = benchmark(entry.__html__)
+        assert html.startswith("<script")
+
+
+@pytest.mark.parametrize("debug", [False, True], ids=["prod", "debug"])
+def test_page_render(benchmark, tmpdir, manifest_file, manifest_size, debug):
+    """Benchmark rendering a page which includes up to 10 entries."""
+    app = make_app(tmpdir, manifest_file, debug=debug)
+    app.jinja_loader = DictLoader({"page.html": PAGE})
+    names = ["entry{}.js".format(i) for i in range(0, min(manifest_size, 20), 2)]
+
+    @app.route("/")
+    def index():
+        return render_template("page.html", names=names)
+
+    client = app.test_client()
+    res = benchmark(client.get, "/")
+    assert res.status_code == 200
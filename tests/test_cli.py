@@ -11,12 +11,21 @@
 """Module tests."""
 
 import importlib.metadata
+import json
+import os
+import time
+from os import makedirs
 from os.path import exists, join
 
+import click
 import pytest
 from click.testing import CliRunner
+from pywebpack import WebpackProject as PyWebpackProject
 
-from flask_webpackext.cli import webpack
+from flask_webpackext import WebpackProject
+from flask_webpackext.cli import buildapps, clean, create, webpack
+from flask_webpackext.project import WebpackBundleProject, WebpackTemplateProject
+from flask_webpackext.storage import HardlinkStorage
 
 
 def test_webpack(project):
@@ -92,6 +101,63 @@ def test_simple_run_error(project, project_assets_dir, runner, cli_obj):
     assert result.exit_code != 0
 
 
+def _set_scripts(project_assets_dir, scripts):
+    path = join(project_assets_dir, "package.json")
+    with open(path) as fp:
+        package_json = json.load(fp)
+    package_json["scripts"] = scripts
+    with open(path, "w") as fp:
+        json.dump(package_json, fp)
+
+
+def test_run_streaming(project, project_assets_dir, runner, cli_obj):
+    """Test run command output, exit status and timeout."""
+    _set_scripts(
+        project_assets_dir,
+        {"hello": "echo hello-from-script", "fail": "exit 3", "slow": "sleep 30"},
+    )
+    result = runner.invoke(webpack, ["run", "hello"], obj=cli_obj)
+    assert result.exit_code == 0
+    assert "hello-from-script" in result.output
+
+    result = runner.invoke(webpack, ["run", "fail"], obj=cli_obj)
+    assert result.exit_code == 3
+
+    start = time.monotonic()
+    result = runner.invoke(webpack, ["run", "--timeout", "1", "slow"], obj=cli_obj)
+    assert result.exit_code == 124
+    assert time.monotonic() - start < 10
+
+
+class _RecordingProject(WebpackProject):
+    """Project which records its builds."""
+
+    builds = []
+
+    def build(self, *args, **kwargs):
+        """Record the build."""
+        self.builds.append(args)
+        return super().build(*args, **kwargs)
+
+
+def test_build_project_api(app, project_assets_dir, runner, cli_obj):
+    """Test build and run commands use the methods of the project."""
+    _set_scripts(project_assets_dir, {"build": "echo built-by-script && exit 3"})
+    _RecordingProject.builds = []
+    app.config["WEBPACKEXT_PROJECT"] = _RecordingProject(project_assets_dir)
+    result = runner.invoke(webpack, ["build", "--", "--mode"], obj=cli_obj)
+    assert result.exit_code == 3
+    assert "built-by-script" in result.output
+    assert _RecordingProject.builds == [("--mode",)]
+
+    # Projects without streaming support run the scripts without timeout.
+    _set_scripts(project_assets_dir, {"hello": "echo hello"})
+    app.config["WEBPACKEXT_PROJECT"] = PyWebpackProject(project_assets_dir)
+    result = runner.invoke(webpack, ["run", "--timeout", "5", "hello"], obj=cli_obj)
+    assert result.exit_code == 0
+    assert "does not support --timeout" in result.output
+
+
 def test_simple_buildall(project, project_assets_dir, runner, cli_obj):
     """Test buildall command on simple project."""
     bundle_js = join(project_assets_dir, "build/bundle.js")
@@ -121,3 +187,196 @@ def test_tpl_build(projecttpl, runner, cli_obj, app):
     result = runner.invoke(webpack, ["create", "build"], obj=cli_obj)
     assert result.exit_code == 0
     assert exists(bundle_js)
+
+
+def test_bundle_create_jobs(projectbundle, runner, cli_obj, app, monkeypatch):
+    """Test create command with concurrent bundle copying."""
+    workers = []
+    collect = WebpackBundleProject.collect
+
+    def recording_collect(self, force=None):
+        workers.append(self.copy_workers)
+        return collect(self, force=force)
+
+    monkeypatch.setattr(WebpackBundleProject, "collect", recording_collect)
+    result = runner.invoke(webpack, ["create", "--jobs", "2"], obj=cli_obj)
+    assert result.exit_code == 0
+    assert workers == [2]
+    assert app.config["WEBPACKEXT_COPY_WORKERS"] == 1
+    assert exists(join(app.instance_path, "assets/app1.js"))
+    assert exists(join(app.instance_path, "assets/app2.js"))
+
+
+def test_bundle_create_up_to_date(projectbundle, runner, cli_obj, app):
+    """Test create is skipped when its inputs did not change."""
+    result = runner.invoke(webpack, ["create"], obj=cli_obj)
+    assert result.exit_code == 0
+    assert "Created webpack project." in result.output
+    assert exists(join(app.instance_path, "assets/config.json"))
+    assert exists(join(app.instance_path, "assets/package.json"))
+
+    result = runner.invoke(webpack, ["create"], obj=cli_obj)
+    assert result.exit_code == 0
+    assert "is up to date, skipped" in result.output
+
+    # The project is recreated if a copied file is missing ...
+    os.remove(join(app.instance_path, "assets/app1.js"))
+    result = runner.invoke(webpack, ["create"], obj=cli_obj)
+    assert "Created webpack project." in result.output
+    assert exists(join(app.instance_path, "assets/app1.js"))
+
+    # ... or if the storage class changed.
+    app.config["WEBPACKEXT_STORAGE_CLS"] = HardlinkStorage
+    result = runner.invoke(webpack, ["create"], obj=cli_obj)
+    assert "Created webpack project." in result.output
+
+    result = runner.invoke(webpack, ["--force", "create"], obj=cli_obj)
+    assert result.exit_code == 0
+    assert "Created webpack project." in result.output
+
+    result = runner.invoke(webpack, ["clean", "create"], obj=cli_obj)
+    assert result.exit_code == 0
+    assert "Created webpack project." in result.output
+
+
+def _copy_project(app, tmpdir):
+    """Template project whose build copies ``app.js`` into the dist folder."""
+    folder = join(tmpdir, "template")
+    makedirs(folder)
+    build = (
+        "mkdir -p ../static/dist && cp app.js ../static/dist/app.js && "
+        "cp manifest.json ../static/dist/manifest.json"
+    )
+    with open(join(folder, "package.json"), "w") as fp:
+        json.dump({"name": "tpl", "scripts": {"build": build}}, fp)
+    with open(join(folder, "manifest.json"), "w") as fp:
+        json.dump({"app.js": "/static/dist/app.js"}, fp)
+    with open(join(folder, "app.js"), "w") as fp:
+        fp.write("v1")
+    app.config["WEBPACKEXT_PROJECT"] = WebpackTemplateProject(__name__, folder)
+    return folder
+
+
+def test_build_up_to_date(app, runner, cli_obj, tmpdir):
+    """Test build is skipped only while the project directory is unchanged."""
+    folder = _copy_project(app, tmpdir)
+    dist_js = join(app.static_folder, "dist", "app.js")
+
+    result = runner.invoke(webpack, ["create", "build"], obj=cli_obj)
+    assert result.exit_code == 0, result.output
+    result = runner.invoke(webpack, ["create", "build"], obj=cli_obj)
+    assert result.output.count("is up to date, skipped") == 2
+
+    # A build alone builds the project directory, which was not recreated.
+    with open(join(folder, "app.js"), "w") as fp:
+        fp.write("v2")
+    result = runner.invoke(webpack, ["build"], obj=cli_obj)
+    assert result.exit_code == 0, result.output
+    with open(dist_js) as fp:
+        assert fp.read() == "v1"
+
+    result = runner.invoke(webpack, ["create", "build"], obj=cli_obj)
+    assert result.exit_code == 0, result.output
+    assert "Built webpack project." in result.output
+    with open(dist_js) as fp:
+        assert fp.read() == "v2"
+
+
+def test_build_skipped_after_build(app, runner, cli_obj, tmpdir):
+    """Test the options of a skipped build are still applied."""
+    _copy_project(app, tmpdir)
+    result = runner.invoke(webpack, ["create", "build"], obj=cli_obj)
+    assert result.exit_code == 0, result.output
+
+    result = runner.invoke(webpack, ["build", "--compile-manifest"], obj=cli_obj)
+    assert result.exit_code == 0, result.output
+    assert "is up to date, skipped" in result.output
+    assert "Compiled manifest" in result.output
+    assert exists(join(app.static_folder, "dist", "manifest.bin"))
+
+
+def test_invoke_command(projectbundle, runner, cli_obj, app):
+    """Test commands invoked from other commands run right away."""
+
+    @click.command()
+    @click.pass_context
+    def deploy(ctx):
+        ctx.invoke(create)
+        assert exists(join(app.instance_path, "assets/app1.js"))
+        ctx.invoke(clean)
+
+    result = runner.invoke(deploy, obj=cli_obj)
+    assert result.exit_code == 0, result.output
+    assert "Created webpack project." in result.output
+    assert "Cleaned webpack project." in result.output
+    assert not exists(join(app.instance_path, "assets"))
+
+
+def test_timings(projectbundle, runner, cli_obj, app, tmpdir):
+    """Test timings of the create command."""
+    report = join(tmpdir, "timings.json")
+    result = runner.invoke(
+        webpack,
+        ["--timings", "--timings-report", report, "create", "clean"],
+        obj=cli_obj,
+    )
+    assert result.exit_code == 0
+    assert "total" in result.output
+    with open(report) as fp:
+        data = json.load(fp)
+    phases = {p["phase"]: p for p in data["phases"]}
+    assert set(phases) == {"create", "clean"}
+    assert phases["create"]["files_copied"] >= 2
+    assert phases["create"]["bytes_written"] > 0
+    assert data["total_seconds"] >= phases["create"]["seconds"]
+
+
+def test_buildapps(tmpdir, runner, monkeypatch):
+    """Test building the projects of several applications."""
+    for name in ["app_a", "app_b"]:
+        project = join(tmpdir, name)
+        makedirs(project)
+        dist = "../{}_static/dist".format(name)
+        build = (
+            "mkdir -p {0} && printf app > {0}/app.js && "
+            'printf \'{{"app": "/static/dist/app.js"}}\' > {0}/manifest.json'
+        ).format(dist)
+        with open(join(project, "package.json"), "w") as fp:
+            json.dump({"name": name, "scripts": {"build": build}}, fp)
+        with open(join(tmpdir, name + ".py"), "w") as fp:
+            fp.write(
+                "from flask import Flask\n"
+                "from flask_webpackext import FlaskWebpackExt, WebpackProject\n"
+                "def create_app():\n"
+                "    app = Flask(__name__, static_folder={!r},\n"
+                "                static_url_path='/static')\n"
+                "    FlaskWebpackExt(app)\n"
+                "    app.config['WEBPACKEXT_PROJECT'] = WebpackProject({!r})\n"
+                "    app.config['WEBPACKEXT_PRECOMPRESS'] = True\n"
+                "    app.config['WEBPACKEXT_PRECOMPRESS_ENCODINGS'] = ['gzip']\n"
+                "    return app\n".format(name + "_static", project)
+            )
+    monkeypatch.syspath_prepend(tmpdir)
+    monkeypatch.chdir(tmpdir)
+
+    result = runner.invoke(
+        buildapps,
+        ["app_a:create_app", "app_b:create_app", "-p", "2"],
+    )
+    assert result.exit_code == 0, result.output
+    assert "app_a:create_app: built in" in result.output
+    assert "app_b:create_app: built in" in result.output
+    # The post-build steps ran, and the phases of each build are printed.
+    assert exists(join(tmpdir, "app_a_static/dist/app.js.gz"))
+    assert not exists(join(tmpdir, "app_b_static/dist/manifest.bin"))
+    assert result.output.count("Precompressed 1 files.") == 2
+    assert result.output.count("  precompress") == 2
+    assert result.output.count("  total") == 2
+
+    result = runner.invoke(buildapps, ["app_b:create_app", "--compile-manifest"])
+    assert result.exit_code == 0, result.output
+    assert exists(join(tmpdir, "app_b_static/dist/manifest.bin"))
+
+    result = runner.invoke(buildapps, ["app_a:create_app", "missing:create_app"])
+    assert result.exit_code != 0
+    assert "missing:create_app: failed" in result.output
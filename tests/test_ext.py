@@ -9,7 +9,12 @@
 
 """Module tests."""
 
-from flask import Flask
+import gzip
+import json
+import os
+from os.path import join
+
+from flask import Flask, render_template_string
 
 from flask_webpackext import FlaskWebpackExt
 
@@ -32,3 +37,200 @@ def test_init():
     assert "flask-webpackext" not in app.extensions
     ext.init_app(app)
     assert "flask-webpackext" in app.extensions
+
+
+def test_state_memoization(app, ext):
+    """Test that resolved configuration values are memoized."""
+    app.config["WEBPACKEXT_STORAGE_CLS"] = "pywebpack:LinkStorage"
+    cls_ = ext.storage_cls
+    assert cls_.__name__ == "LinkStorage"
+    assert ext.storage_cls is cls_
+    assert ext._resolved["WEBPACKEXT_STORAGE_CLS"][1] is cls_
+
+    # Replacing the configuration value invalidates the memoized value.
+    app.config["WEBPACKEXT_STORAGE_CLS"] = "pywebpack:FileStorage"
+    assert ext.storage_cls.__name__ == "FileStorage"
+
+    ext.reload()
+    assert ext._resolved == {}
+    assert ext.storage_cls.__name__ == "FileStorage"
+
+
+def test_manifest_preload(instance_path, static_folder, manifest):
+    """Test manifest preloading on initialization."""
+    app = Flask("testapp", instance_path=instance_path, static_folder=static_folder)
+    app.config["WEBPACKEXT_MANIFEST_PRELOAD"] = True
+    FlaskWebpackExt(app)
+    state = app.extensions["flask-webpackext"]
+    assert len(state.manifest_cache) == 1
+    with app.app_context():
+        assert state.manifest.app
+
+
+def test_manifest_preload_missing(instance_path, static_folder):
+    """Test preloading ignores a missing manifest."""
+    app = Flask("testapp", instance_path=instance_path, static_folder=static_folder)
+    app.config["WEBPACKEXT_MANIFEST_PRELOAD"] = True
+    FlaskWebpackExt(app)
+    assert len(app.extensions["flask-webpackext"].manifest_cache) == 0
+
+
+def test_preload_headers(app, static_folder, manifest):
+    """Test preload link headers and early hints."""
+    hints = []
+    app.config.update(
+        WEBPACKEXT_PRELOAD_HEADERS=True,
+        WEBPACKEXT_EARLY_HINTS_HANDLER=hints.append,
+    )
+
+    @app.route("/")
+    def index():
+        return render_template_string("{{ webpack.app }}{{ webpack.app }}")
+
+    client = app.test_client()
+    res = client.get("/")
+    link = "</static/dist/app.js>; rel=preload; as=script"
+    assert res.headers.get_all("Link") == [link]
+    assert hints == []
+
+    client.get("/")
+    assert hints == [[link]]
+
+    # With Subresource Integrity, the links match the tags.
+    with open(join(static_folder, "dist/app.js"), "w") as fp:
+        fp.write("app")
+    app.config["WEBPACKEXT_SUBRESOURCE_INTEGRITY"] = True
+    with app.app_context():
+        value = app.extensions["flask-webpackext"].integrity["/static/dist/app.js"]
+    res = client.get("/")
+    assert res.headers.get_all("Link") == [
+        '{}; integrity="{}"; crossorigin=anonymous'.format(link, value)
+    ]
+
+    app.config["WEBPACKEXT_PRELOAD_HEADERS"] = False
+    assert "Link" not in client.get("/").headers
+
+
+def test_precompressed_dist(instance_path, static_folder, manifest):
+    """Test precompressing and serving the dist files."""
+    app = Flask("testapp", instance_path=instance_path, static_folder=static_folder)
+    app.config.update(
+        WEBPACKEXT_SERVE_DIST=True,
+        WEBPACKEXT_PRECOMPRESS=True,
+        WEBPACKEXT_PRECOMPRESS_ENCODINGS=["gzip"],
+    )
+    FlaskWebpackExt(app)
+    state = app.extensions["flask-webpackext"]
+    app_js = join(static_folder, "dist/app.js")
+    with open(app_js, "w") as fp:
+        fp.write("console.log('app');" * 100)
+
+    with app.app_context():
+        assert state.precompress() == [app_js + ".gz"]
+        assert state.precompress() == []
+
+    client = app.test_client()
+    res = client.get("/static/dist/app.js", headers={"Accept-Encoding": "gzip"})
+    assert res.headers["Content-Encoding"] == "gzip"
+    assert res.headers["Vary"] == "Accept-Encoding"
+    assert res.mimetype == "text/javascript"
+    assert gzip.decompress(res.data) == b"console.log('app');" * 100
+
+    res = client.get("/static/dist/app.js")
+    assert "Content-Encoding" not in res.headers
+    assert res.headers["Vary"] == "Accept-Encoding"
+    assert res.data == b"console.log('app');" * 100
+
+    # An outdated variant is not served once the manifest is reloaded.
+    os.utime(app_js + ".gz", ns=(0, 0))
+    state.reload()
+    res = client.get("/static/dist/app.js", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in res.headers
+
+    assert client.get("/static/dist/missing.js").status_code == 404
+
+
+def test_immutable_dist(instance_path, static_folder):
+    """Test cache headers of hashed manifest files."""
+    dist = join(static_folder, "dist")
+    os.makedirs(dist)
+    with open(join(dist, "manifest.json"), "w") as fp:
+        json.dump(
+            {"app": "/static/dist/app.3f2a1b9c.js", "plain": "/static/dist/plain.js"},
+            fp,
+        )
+    for name in ["app.3f2a1b9c.js", "plain.js", "other.0123abcd.js"]:
+        with open(join(dist, name), "w") as fp:
+            fp.write(name)
+    app = Flask("testapp", instance_path=instance_path, static_folder=static_folder)
+    app.config["WEBPACKEXT_SERVE_DIST"] = True
+    FlaskWebpackExt(app)
+    client = app.test_client()
+
+    res = client.get("/static/dist/app.3f2a1b9c.js")
+    assert res.headers["Cache-Control"] == "public, max-age=31536000, immutable"
+    assert res.headers["ETag"] == '"3f2a1b9c"'
+    res = client.get(
+        "/static/dist/app.3f2a1b9c.js", headers={"If-None-Match": '"3f2a1b9c"'}
+    )
+    assert res.status_code == 304
+
+    # Files without hash or not in the manifest keep the default headers.
+    for name in ["plain.js", "other.0123abcd.js"]:
+        res = client.get("/static/dist/" + name)
+        assert "immutable" not in res.headers.get("Cache-Control", "")
+        assert res.data == name.encode()
+
+
+def test_static_index(instance_path, static_folder, manifest):
+    """Test serving manifest files from the static file index."""
+    app_js = join(static_folder, "dist/app.js")
+    with open(app_js, "w") as fp:
+        fp.write("app")
+    app = Flask("testapp", instance_path=instance_path, static_folder=static_folder)
+    app.config["WEBPACKEXT_SERVE_DIST"] = True
+    FlaskWebpackExt(app)
+    state = app.extensions["flask-webpackext"]
+    client = app.test_client()
+
+    with app.app_context():
+        index = state.static_index
+        static_file = index["/static/dist/app.js"][None]
+    assert static_file.path == app_js
+    assert static_file.size == 3
+    assert static_file.mimetype == "text/javascript"
+    assert not static_file.immutable
+
+    res = client.get("/static/dist/app.js")
+    assert res.data == b"app"
+    assert res.headers["ETag"] == '"{}"'.format(static_file.etag)
+    res = client.get(
+        "/static/dist/app.js", headers={"If-None-Match": res.headers["ETag"]}
+    )
+    assert res.status_code == 304
+
+    # The index is only rebuilt with the manifest.
+    with app.app_context():
+        assert state.static_index is index
+
+    app.config["WEBPACKEXT_X_ACCEL_REDIRECT_PREFIX"] = "/internal/dist/"
+    res = client.get("/static/dist/app.js")
+    assert res.headers["X-Accel-Redirect"] == "/internal/dist/app.js"
+    assert res.data == b""
+
+    app.config.update(WEBPACKEXT_X_ACCEL_REDIRECT_PREFIX=None, USE_X_SENDFILE=True)
+    res = client.get("/static/dist/app.js")
+    assert res.headers["X-Sendfile"] == app_js
+
+    # Files which changed or were removed since the index was built are
+    # served from the disk.
+    app.config["USE_X_SENDFILE"] = False
+    etag = res.headers["ETag"]
+    with open(app_js, "w") as fp:
+        fp.write("changed")
+    res = client.get("/static/dist/app.js", headers={"If-None-Match": etag})
+    assert res.status_code == 200
+    assert res.data == b"changed"
+    assert res.content_length == 7
+    os.remove(app_js)
+    assert client.get("/static/dist/app.js").status_code == 404
@@ -9,13 +9,30 @@
 
 """Module tests."""
 
+import base64
+import hashlib
+import json
 import sys
+import threading
+import time
+from os.path import dirname, exists, join
 
 import pytest
 from flask import render_template_string
 from pywebpack import ManifestLoader
 
-from flask_webpackext.manifest import JinjaManifestLoader
+from flask_webpackext.errors import ManifestKeyNotFoundError
+from flask_webpackext.integrity import integrity_path, load_integrity
+from flask_webpackext.manifest import (
+    CompiledManifest,
+    CompiledManifestLoader,
+    JinjaManifestEntry,
+    JinjaManifestLoader,
+    LazyJinjaManifest,
+    LazyJinjaManifestLoader,
+    ManifestCache,
+    compiled_manifest_path,
+)
 
 
 def test_manifest_loading(appctx, ext, project, manifest):
@@ -59,3 +76,226 @@ def test_manifest_invalid_path(app, appctx, ext):
         ext,
         "manifest",
     )
+
+
+def test_manifest_debug_reload(app, appctx, ext, manifest):
+    """Test manifest is only re-parsed in debug mode when the file changed."""
+    app.debug = True
+    m = ext.manifest
+    assert ext.manifest is m
+
+    with open(manifest, "w") as fp:
+        json.dump({"app": "/static/dist/app.js", "other": "/static/dist/o.js"}, fp)
+    m = ext.manifest
+    assert m.other
+    assert ext.manifest is m
+
+
+def test_manifest_reload_interval(app, appctx, ext, manifest):
+    """Test throttling of the modification check."""
+    app.debug = True
+    app.config["WEBPACKEXT_MANIFEST_RELOAD_INTERVAL"] = 60 * 1000
+    m = ext.manifest
+    with open(manifest, "w") as fp:
+        json.dump({"other": "/static/dist/o.js"}, fp)
+    assert ext.manifest is m
+
+
+def test_manifest_cache_per_app(app, appctx, ext, manifest):
+    """Test manifests are cached by the extension state."""
+    m = ext.manifest
+    assert len(ext.manifest_cache) == 1
+    assert ext.manifest is m
+
+    ext.manifest_cache.clear()
+    assert len(ext.manifest_cache) == 0
+    assert ext.manifest is not m
+
+
+def test_manifest_cache_per_loader(app, appctx, ext, manifest):
+    """Test a replaced manifest loader is used for the cached manifest."""
+    assert not isinstance(ext.manifest, LazyJinjaManifest)
+    app.config["WEBPACKEXT_MANIFEST_LOADER"] = LazyJinjaManifestLoader
+    assert isinstance(ext.manifest, LazyJinjaManifest)
+
+
+def test_manifest_cache_lru():
+    """Test least recently used entries are evicted."""
+    cache = ManifestCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert "a" in cache and "c" in cache
+    assert "b" not in cache
+    assert len(cache) == 2
+
+
+def test_manifest_cache_single_flight():
+    """Test concurrent loads of the same key only load once."""
+    cache = ManifestCache()
+    calls = []
+    barrier = threading.Barrier(8)
+
+    def load(key):
+        calls.append(key)
+        time.sleep(0.05)
+        return key.upper()
+
+    def worker():
+        barrier.wait()
+        assert cache.get_or_load("a", load) == "A"
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert calls == ["a"]
+
+    # Stale values are loaded again.
+    assert cache.get_or_load("a", load, is_fresh=lambda v: False) == "A"
+    assert calls == ["a", "a"]
+
+
+def test_manifest_entry_html_cache(appctx, ext, manifest):
+    """Test entries are rendered only once."""
+    entry = ext.manifest.app
+    html = entry.__html__()
+    assert html == '<script src="/static/dist/app.js"></script>'
+    assert entry.__html__() is html
+
+
+def test_compiled_manifest(app, appctx, ext, manifest):
+    """Test compiling and loading a compiled manifest."""
+    data = {"e{}.js".format(i): "/static/dist/e{}.js".format(i) for i in range(100)}
+    data["app"] = "/static/dist/app.js"
+    with open(manifest, "w") as fp:
+        json.dump(data, fp)
+    app.config["WEBPACKEXT_MANIFEST_LOADER"] = CompiledManifestLoader
+
+    # No compiled manifest: falls back to parsing the manifest.
+    assert not isinstance(ext.manifest, CompiledManifest)
+
+    assert ext.compile_manifest() == compiled_manifest_path(manifest)
+    ext.manifest_cache.clear()
+    m = ext.manifest
+    assert isinstance(m, CompiledManifest)
+    assert m.app.__html__() == '<script src="/static/dist/app.js"></script>'
+    assert list(m["e42.js"]) == ["/static/dist/e42.js"]
+    assert m["e42.js"] is m["e42.js"]
+    assert sorted(e.name for e in m) == sorted(data)
+    pytest.raises(ManifestKeyNotFoundError, m.__getitem__, "missing.js")
+    pytest.raises(ManifestKeyNotFoundError, getattr, m, "missing")
+
+    # An outdated compiled manifest is ignored.
+    with open(manifest, "w") as fp:
+        json.dump({"other": "/static/dist/other.js"}, fp)
+    assert CompiledManifestLoader().load_compiled(manifest) is None
+
+
+def test_lazy_manifest(app, appctx, ext, manifest):
+    """Test lazy creation of manifest entries."""
+    app.config["WEBPACKEXT_MANIFEST_LOADER"] = LazyJinjaManifestLoader
+    m = ext.manifest
+    assert isinstance(m, LazyJinjaManifest)
+    assert dict(m._entries) == {}
+
+    entry = m.app
+    assert isinstance(entry, JinjaManifestEntry)
+    assert m["app"] is entry
+    assert [e.name for e in m] == ["app"]
+    pytest.raises(ManifestKeyNotFoundError, m.__getitem__, "missing.js")
+    pytest.raises(ManifestKeyNotFoundError, getattr, m, "missing")
+
+    m.add(JinjaManifestEntry("other", ["/static/dist/other.js"]))
+    assert list(m.other) == ["/static/dist/other.js"]
+    pytest.raises(KeyError, m.add, JinjaManifestEntry("app", []))
+
+
+def test_manifest_collect(app, appctx, ext, manifest):
+    """Test collecting and rendering entries."""
+    with open(manifest, "w") as fp:
+        json.dump(
+            {
+                "status": "built",
+                "files": {
+                    "a": ["/static/dist/vendor.js", "/static/dist/a.js"],
+                    "b": ["/static/dist/vendor.js", "/static/dist/b.css"],
+                },
+            },
+            fp,
+        )
+    tpl = (
+        "{{ webpack.require('b') }}{{ webpack.require('a', 'b') }}"
+        "{{ webpack.render_collected() }}|"
+        "{{ webpack.require('a') }}{{ webpack.render_collected() }}"
+    )
+    assert render_template_string(tpl) == (
+        '<script src="/static/dist/vendor.js"></script>'
+        '<link rel="stylesheet" href="/static/dist/b.css" />'
+        '<script src="/static/dist/a.js"></script>|'
+    )
+    pytest.raises(ManifestKeyNotFoundError, ext.manifest.require, "missing")
+
+
+def test_manifest_integrity(app, appctx, ext, manifest):
+    """Test Subresource Integrity attributes."""
+    with open(join(dirname(manifest), "app.js"), "w") as fp:
+        fp.write("alert('hello');")
+    digest = base64.b64encode(hashlib.sha384(b"alert('hello');").digest()).decode()
+    expected = (
+        '<script src="/static/dist/app.js" integrity="sha384-{}" '
+        'crossorigin="anonymous"></script>'.format(digest)
+    )
+    app.config["WEBPACKEXT_SUBRESOURCE_INTEGRITY"] = True
+
+    # Computed from the files when no integrity file exists.
+    assert ext.integrity == {"/static/dist/app.js": "sha384-" + digest}
+    assert render_template_string("{{ webpack.app }}") == expected
+
+    # Read from the integrity file.
+    path = ext.write_integrity()
+    assert path == integrity_path(manifest)
+    assert exists(path)
+    assert load_integrity(*ext._integrity_args()) == ext.integrity
+
+    # Entries rendered before Subresource Integrity was enabled are updated.
+    app.config["WEBPACKEXT_SUBRESOURCE_INTEGRITY"] = False
+    ext.reload()
+    plain = render_template_string("{{ webpack.app }}")
+    assert "integrity" not in plain
+    app.config["WEBPACKEXT_SUBRESOURCE_INTEGRITY"] = True
+    assert render_template_string("{{ webpack.app }}") == expected
+
+    # Files missing from the dist directory have no integrity attribute.
+    with open(manifest, "w") as fp:
+        json.dump({"app": "/static/dist/app.js", "gone": "/static/dist/gone.js"}, fp)
+    ext.reload()
+    assert list(ext.integrity) == ["/static/dist/app.js"]
+    assert render_template_string("{{ webpack.app }}") == expected
+    assert render_template_string("{{ webpack.gone }}") == (
+        '<script src="/static/dist/gone.js"></script>'
+    )
+
+    app.config["WEBPACKEXT_SUBRESOURCE_INTEGRITY"] = False
+    assert ext.integrity is None
+    assert ext.write_integrity() is None
+
+
+def test_manifest_parsed_once(app, appctx, ext, manifest, monkeypatch):
+    """Test derived values are computed from the loaded manifest."""
+    with open(join(dirname(manifest), "app.js"), "w") as fp:
+        fp.write("app")
+    loads = []
+    load = ManifestLoader.load
+    monkeypatch.setattr(
+        ManifestLoader,
+        "load",
+        lambda self, path: loads.append(path) or load(self, path),
+    )
+    app.config["WEBPACKEXT_SUBRESOURCE_INTEGRITY"] = True
+    assert ext.integrity["/static/dist/app.js"].startswith("sha384-")
+    assert "/static/dist/app.js" in ext.static_index
+    assert render_template_string("{{ webpack.app }}")
+    assert loads == [manifest]
@@ -9,12 +9,28 @@
 
 """Module tests."""
 
-from os.path import exists, join
+import hashlib
+import os
+from os import makedirs
+from os.path import dirname, exists, join
 
+import pytest
 from flask.helpers import get_root_path
-from pynpm.package import PNPMPackage
+from pynpm.package import NPMPackage, PNPMPackage
 
-from flask_webpackext.project import WebpackBundleProject
+from flask_webpackext import WebpackBundle
+from flask_webpackext.helpers import atomic_write, file_digest
+from flask_webpackext.project import (
+    WebpackBundleProject,
+    WebpackTemplateProject,
+    flask_config,
+)
+from flask_webpackext.storage import (
+    CopyIndex,
+    HardlinkStorage,
+    IncrementalFileStorage,
+)
+from flask_webpackext.watch import ProjectWatcher
 
 
 def test_project_path(app, projecttpl, appctx):
@@ -52,6 +68,44 @@ def test_bundle_project(projectbundle, appctx, static_folder):
     assert all([exists(join(out, f)) for f in files])
 
 
+def test_flask_config_memoized(app, projectbundle, appctx):
+    """Test flask config is memoized and not shared."""
+    config = flask_config()
+    config["build"]["debug"] = "changed"
+    assert flask_config()["build"]["debug"] is False
+    app.config["WEBPACKEXT_PROJECT_DISTURL"] = "/other"
+    assert flask_config()["build"]["assetsURL"] == "/other/"
+
+
+def test_config_written_when_changed(app, projectbundle, appctx):
+    """Test config.json is only rewritten when its content changes."""
+    p = projectbundle
+    p.create()
+    mtime = os.stat(p.config_path).st_mtime_ns
+    package_mtime = os.stat(join(p.path, "package.json")).st_mtime_ns
+    assert p.write_config() is False
+    p.create()
+    assert os.stat(p.config_path).st_mtime_ns == mtime
+    assert os.stat(join(p.path, "package.json")).st_mtime_ns == package_mtime
+
+    app.config["WEBPACKEXT_PROJECT_DISTURL"] = "/other"
+    assert p.write_config() is True
+    assert '"/other/"' in open(p.config_path).read()
+
+
+def test_config_path_subdirectory(app, appctx, tmpdir):
+    """Test config.json in a directory which is also copied from the template."""
+    folder = join(tmpdir, "template")
+    makedirs(join(folder, "build"))
+    with open(join(folder, "build", "app.js"), "w") as fp:
+        fp.write("a")
+    p = WebpackTemplateProject(__name__, folder, config_path="build/config.json")
+    app.config["WEBPACKEXT_PROJECT"] = p
+    p.create()
+    assert exists(join(p.path, "build", "app.js"))
+    assert exists(join(p.path, "build", "config.json"))
+
+
 def test_super_constructor_kwargs():
     """Test if passing keyword arguments to the super constructor works."""
     project = WebpackBundleProject(
@@ -60,3 +114,258 @@ def test_super_constructor_kwargs():
     assert project.package_json_source_path == join(
         get_root_path(__name__), "project", "paket.json"
     )
+
+
+def test_incremental_create(app, projectbundle, appctx, tmpdir):
+    """Test incremental project creation."""
+    app.config["WEBPACKEXT_STORAGE_CLS"] = IncrementalFileStorage
+    p = projectbundle
+    p.create()
+    report = p.create_report
+    assert "app1.js" in report.added
+    assert not report.updated and not report.removed
+    assert exists(join(p.path, CopyIndex.filename))
+
+    p.create()
+    report = p.create_report
+    assert "app1.js" in report.unchanged
+    assert not report.added and not report.updated and not report.removed
+
+    # A file which is no longer in any source is removed.
+    index = CopyIndex(p.path)
+    index.entries["stale.js"] = dict(index.entries["app1.js"])
+    index.save()
+    with open(join(p.path, "stale.js"), "w") as fp:
+        fp.write("stale")
+    p.create()
+    assert p.create_report.removed == ["stale.js"]
+    assert not exists(join(p.path, "stale.js"))
+
+
+def test_incremental_storage_changed(tmpdir):
+    """Test incremental storage only copies changed files."""
+    src, dst = join(tmpdir, "src"), join(tmpdir, "dst")
+    makedirs(src)
+    with open(join(src, "a.js"), "w") as fp:
+        fp.write("a")
+
+    index = CopyIndex(dst)
+    IncrementalFileStorage(src, dst, index=index).run()
+    index.save()
+    assert index.added == ["a.js"]
+
+    # Touched but identical content is not copied.
+    os.utime(join(src, "a.js"), ns=(0, 0))
+    index = CopyIndex(dst)
+    IncrementalFileStorage(src, dst, index=index).run()
+    index.save()
+    assert index.unchanged == ["a.js"]
+
+    with open(join(src, "a.js"), "w") as fp:
+        fp.write("b")
+    index = CopyIndex(dst)
+    IncrementalFileStorage(src, dst, index=index).run()
+    assert index.updated == ["a.js"]
+    with open(join(dst, "a.js")) as fp:
+        assert fp.read() == "b"
+
+
+def test_parallel_collect(app, appctx, tmpdir):
+    """Test concurrent bundle copying with conflicting files."""
+    bundles = []
+    for name in ["b1", "b2", "b3"]:
+        folder = join(tmpdir, name)
+        makedirs(join(folder, "js"))
+        for f in ["js/{}.js".format(name), "js/shared.js"]:
+            with open(join(folder, f), "w") as fp:
+                fp.write(name)
+        bundles.append(WebpackBundle(__name__, folder))
+    p = WebpackBundleProject(__name__, "assetsbundle", bundles=bundles)
+    app.config.update(WEBPACKEXT_PROJECT=p, WEBPACKEXT_COPY_WORKERS=3)
+
+    p.create()
+    for name in ["b1", "b2", "b3"]:
+        assert exists(join(p.path, "js", "{}.js".format(name)))
+    with open(join(p.path, "js/shared.js")) as fp:
+        assert fp.read() == "b1"
+
+
+def test_atomic_write(tmpdir):
+    """Test files are replaced once written, and kept if writing fails."""
+    path = join(tmpdir, "data.json")
+    with atomic_write(path, "w") as fp:
+        fp.write("a")
+        assert not exists(path)
+    with pytest.raises(ValueError):
+        with atomic_write(path, "w") as fp:
+            fp.write("b")
+            raise ValueError()
+    with open(path) as fp:
+        assert fp.read() == "a"
+    assert os.listdir(tmpdir) == ["data.json"]
+    assert file_digest(path).hexdigest() == hashlib.sha256(b"a").hexdigest()
+
+
+def test_hardlink_storage(tmpdir):
+    """Test linking storage."""
+    src, dst = join(tmpdir, "src"), join(tmpdir, "dst")
+    makedirs(src)
+    for f in ["a.js", "config.json"]:
+        with open(join(src, f), "w") as fp:
+            fp.write(f)
+
+    HardlinkStorage(src, dst).run()
+    with open(join(dst, "a.js")) as fp:
+        assert fp.read() == "a.js"
+    st_src, st_dst = os.stat(join(src, "a.js")), os.stat(join(dst, "a.js"))
+    # Either reflinked (own inode) or hardlinked (same inode).
+    assert st_dst.st_ino != st_src.st_ino or st_src.st_nlink == 2
+    # JSON files are always copied.
+    assert os.stat(join(dst, "config.json")).st_nlink == 1
+
+    # Running again leaves the files in place.
+    HardlinkStorage(src, dst).run()
+    assert os.stat(join(dst, "a.js")).st_ino == st_dst.st_ino
+
+
+def test_build_cache(app, appctx, tmpdir, static_folder):
+    """Test restoring the build output from the build cache."""
+    folder = join(tmpdir, "bundle")
+    makedirs(folder)
+    with open(join(folder, "app.js"), "w") as fp:
+        fp.write("a")
+    p = WebpackBundleProject(
+        __name__, "assetsbundle", bundles=[WebpackBundle(__name__, folder)]
+    )
+    cache_dir = join(tmpdir, "cache")
+    app.config.update(WEBPACKEXT_PROJECT=p, WEBPACKEXT_BUILD_CACHE_DIR=cache_dir)
+
+    fingerprint = p.fingerprint()
+    assert p.fingerprint() == fingerprint
+
+    # Store a fake build output in the cache.
+    distdir = app.config["WEBPACKEXT_PROJECT_DISTDIR"]
+    makedirs(distdir)
+    with open(join(distdir, "app.js"), "w") as fp:
+        fp.write("built")
+    p.store_build(join(cache_dir, fingerprint))
+    os.remove(join(distdir, "app.js"))
+
+    p.buildall()
+    assert p.build_cache_hit
+    assert exists(join(distdir, "app.js"))
+
+    with open(join(folder, "app.js"), "w") as fp:
+        fp.write("b")
+    assert p.fingerprint() != fingerprint
+
+
+class _RecordingPackage(NPMPackage):
+    """Package which records install calls instead of running npm."""
+
+    installs = []
+
+    def install(self, *args):
+        """Record the call and create ``node_modules``."""
+        self.installs.append(args)
+        makedirs(join(dirname(self.package_json_path), "node_modules"), exist_ok=True)
+        return 0
+
+
+def test_install_skip_unchanged(app, projecttpl, appctx):
+    """Test install is skipped when dependencies did not change."""
+    app.config["WEBPACKEXT_NPM_PKG_CLS"] = _RecordingPackage
+    _RecordingPackage.installs = []
+    p = projecttpl
+    p.create()
+
+    p.install()
+    assert not p.install_skipped
+    p.install()
+    assert p.install_skipped
+    assert len(_RecordingPackage.installs) == 1
+
+    p.install(force=True)
+    assert not p.install_skipped
+
+    with open(join(p.path, "package-lock.json"), "w") as fp:
+        fp.write("{}")
+    p.install()
+    assert not p.install_skipped
+    assert len(_RecordingPackage.installs) == 3
+
+
+def test_buildall_force_install(app, appctx, tmpdir):
+    """Test forcing the installation of a single buildall."""
+    folder = join(tmpdir, "template")
+    makedirs(folder)
+    with open(join(folder, "package.json"), "w") as fp:
+        fp.write('{"name": "tpl", "scripts": {"build": "true"}}')
+    p = WebpackTemplateProject(__name__, folder)
+    app.config.update(WEBPACKEXT_PROJECT=p, WEBPACKEXT_NPM_PKG_CLS=_RecordingPackage)
+    _RecordingPackage.installs = []
+
+    p.buildall()
+    p.buildall()
+    assert p.install_skipped
+    p.buildall(force_install=True)
+    assert not p.install_skipped
+    assert len(_RecordingPackage.installs) == 2
+    assert app.config["WEBPACKEXT_INSTALL_SKIP_UNCHANGED"]
+
+
+def test_watcher_sync(app, appctx, tmpdir):
+    """Test syncing changed source files into the project."""
+    folder = join(tmpdir, "bundle")
+    makedirs(folder)
+    with open(join(folder, "app.js"), "w") as fp:
+        fp.write("a")
+    p = WebpackBundleProject(
+        __name__, "assetsbundle", bundles=[WebpackBundle(__name__, folder)]
+    )
+    app.config["WEBPACKEXT_PROJECT"] = p
+    p.create()
+    watcher = ProjectWatcher(p, poll=True)
+    assert watcher.changes() == set()
+
+    with open(join(folder, "app.js"), "w") as fp:
+        fp.write("changed")
+    with open(join(folder, "new.js"), "w") as fp:
+        fp.write("new")
+    assert watcher.sync(watcher.changes()) == ["app.js", "new.js"]
+    with open(join(p.path, "app.js")) as fp:
+        assert fp.read() == "changed"
+
+    os.remove(join(folder, "new.js"))
+    assert watcher.sync(watcher.changes()) == ["new.js"]
+    assert not exists(join(p.path, "new.js"))
+
+    # Files of the project template are synced, but not package.json.
+    tpl_pkg = join(p.source_folders[0], "package.json")
+    assert watcher.sync([tpl_pkg]) == []
+
+
+def test_watcher_sync_shadowed(app, appctx, tmpdir):
+    """Test syncing a file removed from the first bundle providing it."""
+    folders = [join(tmpdir, "b1"), join(tmpdir, "b2")]
+    for folder in folders:
+        makedirs(folder)
+        with open(join(folder, "shared.js"), "w") as fp:
+            fp.write(folder)
+    p = WebpackBundleProject(
+        __name__, "assetsbundle", bundles=[WebpackBundle(__name__, f) for f in folders]
+    )
+    app.config["WEBPACKEXT_PROJECT"] = p
+    p.create()
+    watcher = ProjectWatcher(p, poll=True)
+    assert watcher.changes() == set()
+
+    # Changes of a shadowed file are ignored.
+    with open(join(folders[1], "shared.js"), "w") as fp:
+        fp.write("changed")
+    assert watcher.sync(watcher.changes()) == []
+
+    os.remove(join(folders[0], "shared.js"))
+    assert watcher.sync(watcher.changes()) == ["shared.js"]
+    with open(join(p.path, "shared.js")) as fp:
+        assert fp.read() == "changed"